@@ -9,6 +9,7 @@ import sys
 import socket
 import requests
 import json
+import time
 from ..http_util import urljoin
 from urllib.parse import urlsplit, \
     urlunsplit, \
@@ -22,4 +23,35 @@ from .. import  util
 
 
 
-DEFAULT_BASE_URL = os.environ.get('COUCHDB_URL', 'http://localhost:5984/')
\ No newline at end of file
+DEFAULT_BASE_URL = os.environ.get('COUCHDB_URL', 'http://localhost:5984/')
+
+def clone_session(session: requests.Session) -> requests.Session:
+    """Create a new `requests.Session` with the same authentication, headers
+    and cookies as `session`, but with its own connection pool. Useful when
+    several threads need to talk to the server concurrently.
+    """
+    clone = requests.Session()
+    clone.headers.update(session.headers)
+    clone.cookies.update(session.cookies)
+    clone.auth = session.auth
+    clone.verify = session.verify
+    clone.cert = session.cert
+    clone.proxies.update(session.proxies)
+    return clone
+
+
+def encode_params(options: dict) -> dict:
+    """Encode query string parameters the way CouchDB expects them: strings
+    as they are, booleans as ``true``/``false`` and everything else as JSON.
+    Parameters set to `None` are left out.
+    """
+    params = {}
+    for name, value in options.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = 'true' if value else 'false'
+        elif not isinstance(value, str):
+            value = json.dumps(value)
+        params[name] = value
+    return params
@@ -28,7 +28,18 @@ __docformat__ = 'restructuredtext en'
 from .server import Server
 from .database import Database
 from .document import Document
-from .find import FindQuery
+from .changes import ChangesFeed
+from .processor import ChangesProcessor
+from .hub import ChangesHub, Subscription
+from .replication import Replicator
+from .fleet import ReplicationFleet
+from .conflicts import ConflictResolver
+from .sync import missing_revisions, diff_databases
+from .attachments import AttachmentStream, UploadStream
+from .checkpoint import CheckpointStore, LocalDocumentCheckpointStore, FileCheckpointStore, \
+    SQLiteCheckpointStore, Checkpointer
+from .find import FindQuery, AdaptivePageSize, IndexAdvisor, compile_selector, \
+    Param, PreparedQuery, FindIterator
 from .exceptions import CouchDBException, UnauthorizedException, DocumentConflictException, NotFoundException
-from .view import View, ViewResults, Row
+from .view import View, PreparedView, ViewResults, ViewColumns, Row
 
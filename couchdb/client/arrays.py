@@ -0,0 +1,93 @@
+"""Export of view results into NumPy arrays.
+
+NumPy is an optional dependency; it is only imported when one of the export
+functions is actually used.
+"""
+
+from collections.abc import Mapping
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('NumPy is required to export view results as arrays')
+    return numpy
+
+
+def _column(np, values, dtype, count):
+    """Build a one-dimensional array from an iterable of scalars.
+
+    When a dtype is declared the values are streamed straight into the array
+    with ``numpy.fromiter``; otherwise NumPy has to see all of them to infer
+    the dtype.
+    """
+    if dtype is None:
+        return np.array(list(values))
+    return np.fromiter(values, dtype=dtype, count=count)
+
+
+def _flatten(np, name, values, dtype, count, ids):
+    """Turn a column of compound (list) values into one array per element.
+
+    `dtype` is either a single dtype used for every element, or a sequence
+    with one dtype per element; in the latter case it also fixes the number
+    of elements. Otherwise the width is taken from the first value.
+
+    :raise ValueError: if a value is not a list of that width
+    """
+    if isinstance(dtype, (list, tuple)):
+        dtypes = list(dtype)
+    else:
+        width = len(values[0]) if count else 0
+        dtypes = [dtype] * width
+    for row, value in enumerate(values):
+        if not isinstance(value, (list, tuple)) or len(value) != len(dtypes):
+            doc = ' (document %r)' % ids[row] if ids[row] is not None else ''
+            raise ValueError('row %d%s has the %s %r, expected %d elements'
+                             % (row, doc, name, value, len(dtypes)))
+    return dict(
+        ('%s_%d' % (name, i), _column(np, (v[i] for v in values), dt, count))
+        for i, dt in enumerate(dtypes)
+    )
+
+
+def columns_to_numpy(columns, key_dtype=None, value_dtype=None, id_dtype=None,
+                     count=None):
+    """Convert `ViewColumns` into a dictionary of NumPy arrays.
+
+    The result has an ``id`` array (unless the view is a reduce view), and
+    ``key``/``value`` arrays. Compound keys or values (JSON arrays) are
+    flattened into one array per element, named ``key_0``, ``key_1``, etc.
+
+    :param columns: the `ViewColumns` to export
+    :param key_dtype: dtype of the key column, or a sequence of dtypes for
+                      compound keys (one per key element)
+    :param value_dtype: dtype of the value column, or a sequence of dtypes
+                        for compound values
+    :param id_dtype: dtype of the document ID column; string columns default
+                     to the smallest fitting unicode dtype
+    :param count: export only the first `count` rows
+    :return: a dictionary mapping column names to arrays
+    :rtype: `dict`
+    """
+    np = _numpy()
+    if count is None:
+        count = len(columns)
+    ids, keys, values = columns.ids, columns.keys, columns.values
+    if count < len(columns):
+        ids, keys, values = ids[:count], keys[:count], values[:count]
+
+    arrays = {}
+    if count and ids[0] is not None:
+        arrays['id'] = _column(np, ids, id_dtype, count)
+    for name, data, dtype in (('key', keys, key_dtype),
+                              ('value', values, value_dtype)):
+        if count and isinstance(data[0], (list, tuple)):
+            arrays.update(_flatten(np, name, data, dtype, count, ids))
+        elif count and isinstance(data[0], Mapping):
+            raise TypeError('cannot export JSON objects in the %s column' % name)
+        else:
+            arrays[name] = _column(np, data, dtype, count)
+    return arrays
+
@@ -0,0 +1,254 @@
+"""Streaming access to attachments."""
+
+from .__common__ import *
+from .exceptions import CouchDBException
+import base64
+import hashlib
+import io
+import mmap
+import stat
+import tempfile
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# os.umask can only be read by setting it, which is not thread-safe, so this
+# is done once on import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _expected_md5(response, digest=None):
+    """The base64 MD5 digest the attachment content should have, if known:
+    from the ``Content-MD5`` header, or from the ``md5-`` digest of the
+    attachment stub.
+    """
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        # requests decompresses the body, so it no longer matches the digest
+        return None
+    value = response.headers.get('Content-MD5')
+    if value is None and digest and digest.startswith('md5-'):
+        value = digest[4:]
+    return value
+
+
+class AttachmentStream(io.RawIOBase):
+    """A read-only file-like object streaming the content of an attachment
+    from the response, one chunk at a time.
+
+    While the content is read, its MD5 digest is computed incrementally and
+    checked against the one sent by the server once the end is reached, so
+    corrupted transfers are detected without holding the whole attachment in
+    memory.
+
+    >>> with db.get_attachment('doc', 'photo.jpg') as f:        # doctest: +SKIP
+    ...     header = f.read(16)
+
+    :param response: the streamed `requests.Response`
+    :param digest: the ``digest`` of the attachment stub, used when the
+                   server does not send a ``Content-MD5`` header
+    :param verify: check the digest at the end of the content
+    :param chunk_size: the number of bytes read from the connection at once
+    """
+
+    def __init__(self, response, digest=None, verify=True, chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__()
+        self.response = response
+        self.content_type = response.headers.get('Content-Type')
+        length = response.headers.get('Content-Length')
+        encoding = response.headers.get('Content-Encoding', 'identity')
+        self.length = int(length) if length is not None and encoding == 'identity' else None
+        self._expected = _expected_md5(response, digest) if verify else None
+        self._md5 = hashlib.md5() if self._expected is not None else None
+        self._chunks = response.iter_content(chunk_size)
+        self._buffer = b''
+        self._offset = 0
+        self._eof = False
+
+    def __repr__(self):
+        return '<%s %s %r>' % (type(self).__name__, self.response.url, self.content_type)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._offset >= len(self._buffer) and not self._next_chunk():
+            return 0
+        n = min(len(b), len(self._buffer) - self._offset)
+        b[:n] = self._buffer[self._offset:self._offset + n]
+        self._offset += n
+        return n
+
+    def read_chunks(self):
+        """Iterate over the rest of the content in the chunks it arrives in,
+        without copying it.
+        """
+        if self._offset < len(self._buffer):
+            chunk = self._buffer[self._offset:]
+            self._offset = len(self._buffer)
+            yield chunk
+        while self._next_chunk():
+            self._offset = len(self._buffer)
+            yield self._buffer
+
+    def close(self):
+        if not self.closed:
+            self.response.close()
+        super().close()
+
+    def _next_chunk(self):
+        if self._eof:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                if self._md5 is not None:
+                    self._md5.update(chunk)
+                self._buffer = chunk
+                self._offset = 0
+                return True
+        self._eof = True
+        self._verify()
+        return False
+
+    def _verify(self):
+        if self._md5 is None:
+            return
+        actual = base64.b64encode(self._md5.digest()).decode('ascii')
+        if actual != self._expected:
+            raise CouchDBException('digest_mismatch', 'attachment digest is md5-%s, expected md5-%s'
+                                   % (actual, self._expected))
+
+
+def download(stream, dest) -> int:
+    """Write the content of an `AttachmentStream` to `dest` chunk by chunk.
+
+    :param stream: the `AttachmentStream`
+    :param dest: a path, or a writable file-like object (which is not
+                 closed); a file at the path is only replaced once the
+                 content is completely downloaded and verified
+    :return: the number of bytes written
+    """
+    with stream:
+        if hasattr(dest, 'write'):
+            return _copy(stream, dest)
+        path = os.fspath(dest)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                   prefix=os.path.basename(path) + '.', suffix='.part')
+        try:
+            if hasattr(os, 'fchmod'):
+                # mkstemp creates the file readable by its owner only
+                os.fchmod(fd, _file_mode(path))
+            with os.fdopen(fd, 'wb') as f:
+                size = _copy(stream, f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return size
+
+
+def _file_mode(path):
+    """The permissions for a download to `path`: those of the file it
+    replaces, or those `open` would give a new file.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def _copy(stream, f):
+    size = 0
+    for chunk in stream.read_chunks():
+        f.write(chunk)
+        size += len(chunk)
+    return size
+
+
+class UploadStream(object):
+    """A request body streaming attachment content from a file or a buffer.
+
+    `requests` reads the body in blocks through `read`, so the content is
+    never loaded or copied as a whole: files are read a block at a time, and
+    buffers (``bytes``, ``mmap``, ``memoryview`` and anything else supporting
+    the buffer protocol) are sent as slices of a `memoryview` of them. Its
+    `len` is the number of bytes left, from which `requests` sets the
+    ``Content-Length`` header; if the size of a file cannot be determined,
+    the content is sent with chunked transfer encoding.
+
+    :param content: a binary file object, or a buffer
+    :param length: the number of bytes to send; by default the size of the
+                   buffer, or of the file from its current position
+    :param progress: a callable receiving the number of bytes sent so far and
+                     the total, after every block
+    """
+
+    def __init__(self, content, length=None, progress=None):
+        if isinstance(content, io.TextIOBase) and hasattr(content, 'buffer'):
+            # send the bytes of files opened in text mode as they are
+            content = content.buffer
+        if hasattr(content, 'read') and not isinstance(content, mmap.mmap):
+            self._file = content
+            self._view = None
+            if length is None:
+                length = _remaining_size(content)
+        else:
+            self._file = None
+            self._view = memoryview(content).cast('B')
+            if length is None:
+                length = len(self._view)
+        self.length = length
+        self.progress = progress
+        self.sent = 0
+
+    def __repr__(self):
+        return '<%s %d/%r>' % (type(self).__name__, self.sent, self.length)
+
+    def __len__(self):
+        # requests sends bodies of unknown (zero) length chunked
+        return self.length - self.sent if self.length is not None else 0
+
+    def __bool__(self):
+        # a body of unknown length is not empty
+        return True
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(DEFAULT_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self) if self.length is not None else -1
+        elif self.length is not None:
+            size = min(size, len(self))
+        if self._view is not None:
+            chunk = self._view[self.sent:self.sent + size]
+        else:
+            chunk = self._file.read(size)
+        if chunk:
+            self.sent += len(chunk)
+            if self.progress is not None:
+                self.progress(self.sent, self.length)
+        return chunk
+
+
+def _remaining_size(f):
+    """The number of bytes from the current position to the end of a file,
+    or `None` if it cannot be known without reading it.
+    """
+    try:
+        size = os.fstat(f.fileno()).st_size
+        return max(0, size - f.tell())
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    try:
+        position = f.tell()
+        end = f.seek(0, io.SEEK_END)
+        f.seek(position)
+        return end - position
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
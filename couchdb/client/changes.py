@@ -0,0 +1,308 @@
+"""Streaming consumption of the ``_changes`` feed."""
+
+from .__common__ import *
+from contextlib import contextmanager
+from .document import Document
+from .exceptions import CouchDBException
+from .prefetch import Prefetcher
+from .checkpoint import as_checkpointer
+
+
+# A line of the feed that only carried a heartbeat (or some other framing)
+HEARTBEAT = None
+
+
+class _ServerError(CouchDBException):
+    """A 5xx response, which `ChangesFeed` retries like a broken connection."""
+
+
+def request_changes(session, url, options, stream=True, timeout=None):
+    """Send a ``_changes`` request, POSTing the ``_selector`` or ``doc_ids``
+    filter arguments when they are present in `options`.
+
+    :raise CouchDBException: if the server rejects the request; the response
+                             is closed first
+    """
+    options = dict(options)
+    body = None
+    if options.get('filter') == '_selector':
+        body = options.pop('_selector', None)
+    elif options.get('filter') == '_doc_ids' and 'doc_ids' in options:
+        body = {'doc_ids': options.pop('doc_ids')}
+    params = encode_params(options)
+    if body is None:
+        response = session.get(url, params=params, stream=stream, timeout=timeout)
+    else:
+        response = session.post(url, json=body, params=params, stream=stream, timeout=timeout)
+    if not response.ok:
+        error = CouchDBException.auto(response)
+        response.close()
+        if response.status_code >= 500:
+            error = _ServerError(error.error, error.reason)
+        raise error
+    return response
+
+
+def iter_lines(response, chunk_size=8192, max_line=16 * 1024 * 1024):
+    """Iterate over the lines of a streamed response body, reading `chunk_size`
+    bytes at a time and never buffering more than `max_line` bytes.
+
+    :raise CouchDBException: if a line exceeds `max_line` bytes
+    """
+    pending = b''
+    for chunk in response.iter_content(chunk_size):
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line
+        if len(pending) > max_line:
+            response.close()
+            raise CouchDBException('line_too_long', 'changes feed line exceeds %d bytes' % max_line)
+    if pending:
+        yield pending
+
+
+def parse_line(line):
+    """Decode one line of a changes response in any feed mode.
+
+    The ``normal`` and ``longpoll`` feeds wrap the changes in a ``results``
+    array, but CouchDB writes every change on a line of its own, so they can be
+    parsed line by line like the ``continuous`` feed.
+
+    :return: the change or ``last_seq`` object, or `HEARTBEAT` for empty lines
+             and the framing of the results array
+    """
+    line = line.strip()
+    if not line or line.startswith(b'{"results":') or line in (b']', b'],'):
+        return HEARTBEAT
+    if line.startswith(b'"last_seq"'):
+        # the tail of the normal feed: "last_seq":...,"pending":...}
+        return json.loads(b'{' + line)
+    return json.loads(line.rstrip(b','))
+
+
+class ChangesFeed(object):
+    """A streaming, self-healing reader of a database's ``_changes`` feed.
+
+    The response is read incrementally, line by line, so memory use stays
+    bounded by the longest line whatever the size of the feed. If the
+    connection breaks or the server answers with a 5xx error, the feed
+    reconnects after a growing delay (starting at `retry_delay` and doubling
+    up to `max_retry_delay`) and resumes from the last sequence it has seen.
+
+    With ``feed='normal'`` iteration ends once the feed is read up to the
+    current end of the database. With ``'longpoll'`` or ``'continuous'`` the
+    feed keeps waiting for new changes, issuing new requests as necessary,
+    until `close` is called or the consumer stops iterating.
+
+    >>> feed = db.changes_feed(since='now', include_docs=True)   # doctest: +SKIP
+    >>> for batch in feed.batches(100, max_wait=1.0):           # doctest: +SKIP
+    ...     process(batch)                                      # doctest: +SKIP
+
+    :param db: the `Database`
+    :param feed: ``'normal'``, ``'longpoll'`` or ``'continuous'``
+    :param since: the sequence to start from
+    :param heartbeat: milliseconds between heartbeats sent by the server on
+                      idle ``longpoll``/``continuous`` feeds; with `None`
+                      the server sends none and reads never time out
+    :param max_retries: give up after this many consecutive failed attempts;
+                        `None` retries forever
+    :param checkpoint: a `CheckpointStore` or `Checkpointer` to resume from
+                       when `since` is not given, and to record progress in.
+                       A change counts as processed once the consumer asks
+                       for the next one (or the next batch).
+    :param options: other ``_changes`` query parameters, e.g. ``filter``,
+                    ``include_docs`` or ``style``
+    """
+
+    def __init__(self, db, feed='continuous', since=None, heartbeat=30000,
+                 retry_delay=0.5, max_retry_delay=30, max_retries=None,
+                 chunk_size=8192, max_line=16 * 1024 * 1024, checkpoint=None, **options):
+        if feed not in ('normal', 'longpoll', 'continuous'):
+            raise ValueError('unsupported feed %r' % feed)
+        self.db = db
+        self.feed = feed
+        self.last_seq = since
+        self.heartbeat = heartbeat
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_retries = max_retries
+        self.chunk_size = chunk_size
+        self.max_line = max_line
+        self.options = options
+        self.checkpoint = as_checkpointer(checkpoint)
+        if since is None and hasattr(self.checkpoint, 'load'):
+            self.last_seq = self.checkpoint.load()
+        self._response = None
+        self._closed = False
+
+    def __repr__(self):
+        return '<%s %r feed=%s since=%r>' % (type(self).__name__, self.db.name,
+                                            self.feed, self.last_seq)
+
+    def __iter__(self):
+        with self._checkpointing():
+            for change in self.events():
+                if change is not HEARTBEAT:
+                    yield change
+                    self._processed(change['seq'])
+            self._processed(self.last_seq)
+
+    def close(self):
+        """Stop the feed and drop its connection."""
+        self._closed = True
+        if self._response is not None:
+            self._response.close()
+
+    def batches(self, size=100, max_wait=None):
+        """Iterate over the changes in lists of at most `size` changes.
+
+        A partial batch is yielded once `max_wait` seconds have passed since
+        its first change arrived; this is checked whenever a change or a
+        heartbeat comes in, so the server heartbeat should be shorter than
+        `max_wait`.
+        """
+        with self._checkpointing():
+            for batch in self._batches(size, max_wait):
+                yield batch
+                self._processed(batch[-1]['seq'])
+            self._processed(self.last_seq)
+
+    def _batches(self, size, max_wait):
+        batch = []
+        started = None
+        for change in self.events():
+            if change is not HEARTBEAT:
+                if not batch:
+                    started = time.monotonic()
+                batch.append(change)
+            if batch and (len(batch) >= size or (
+                    max_wait is not None and time.monotonic() - started >= max_wait)):
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def documents(self, batch=100, lookahead=2, max_wait=None, wrapper=Document):
+        """Iterate over the changes with the current document in their ``doc``
+        member, fetched with ``_bulk_get`` instead of ``include_docs``.
+
+        The feed itself only carries IDs and revisions. Every batch of up to
+        `batch` changes is fetched in one ``_bulk_get`` request, on a
+        background thread that runs up to `lookahead` batches ahead of the
+        consumer. Changes that are not worth fetching are skipped:
+
+        * deleted documents,
+        * changes followed by a later change to the same document in the same
+          batch, and
+        * changes whose revision is no longer the current one when fetched;
+          the feed delivers the newer revision later on.
+
+        Since the feed is read ahead, `last_seq` may be past the changes
+        consumed so far; checkpoint with the ``seq`` of the changes instead.
+
+        :param batch: the maximum number of documents per ``_bulk_get``
+        :param lookahead: the number of fetched batches to buffer
+        :param max_wait: fetch a partial batch once its first change has
+                         waited this many seconds (see `batches`)
+        :param wrapper: a callable applied to each fetched document
+        """
+        if self.options.get('include_docs'):
+            raise ValueError('documents() fetches the documents itself; '
+                             'do not set include_docs')
+        fetched = Prefetcher((self._fetch(changes, wrapper)
+                              for changes in self._batches(batch, max_wait)), lookahead)
+        with self._checkpointing():
+            finished = False
+            try:
+                for changes in fetched:
+                    for change in changes:
+                        yield change
+                        self._processed(change['seq'])
+                finished = True
+            finally:
+                if not finished:
+                    # unblock the reader thread before waiting for it
+                    self.close()
+                fetched.close()
+            self._processed(self.last_seq)
+
+    def _processed(self, seq):
+        if self.checkpoint is not None and seq is not None:
+            self.checkpoint(seq)
+
+    @contextmanager
+    def _checkpointing(self):
+        try:
+            yield
+        finally:
+            flush = getattr(self.checkpoint, 'flush', None)
+            if flush is not None:
+                flush()
+
+    def _fetch(self, changes, wrapper):
+        latest = {}
+        for change in changes:
+            if change.get('deleted'):
+                latest.pop(change['id'], None)
+            else:
+                latest[change['id']] = change
+        changes = [change for change in changes if latest.get(change['id']) is change]
+        if not changes:
+            return changes
+        results = self.db.bulk_get([change['id'] for change in changes])
+        fetched = []
+        for change, result in zip(changes, results):
+            doc = result['docs'][0].get('ok')
+            if doc is None or doc['_rev'] != change['changes'][0]['rev']:
+                # deleted or updated since
+                continue
+            change['doc'] = wrapper(doc) if wrapper is not None else doc
+            fetched.append(change)
+        return fetched
+
+    def events(self):
+        """Iterate over the changes, with `HEARTBEAT` (`None`) for every
+        heartbeat or other line that carries no change.
+        """
+        failures = 0
+        while not self._closed:
+            try:
+                done = False
+                for item in self._read():
+                    failures = 0
+                    if item is not HEARTBEAT and 'last_seq' in item:
+                        self.last_seq = item['last_seq']
+                        done = self.feed == 'normal'
+                        yield HEARTBEAT
+                        continue
+                    if item is not HEARTBEAT:
+                        self.last_seq = item.get('seq', self.last_seq)
+                    yield item
+                if done or self._closed:
+                    return
+            except (requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError, _ServerError):
+                if self._closed:
+                    return
+                failures += 1
+                if self.max_retries is not None and failures > self.max_retries:
+                    raise
+                time.sleep(min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay))
+
+    def _read(self):
+        options = dict(self.options, feed=self.feed, since=self.last_seq)
+        timeout = None
+        if self.feed != 'normal' and self.heartbeat is not None:
+            options['heartbeat'] = self.heartbeat
+            # If not even a heartbeat arrives in time, the connection is dead
+            timeout = (10, 2 * self.heartbeat / 1000.0 + 10)
+        response = request_changes(self.db.session, urljoin(self.db.url, '_changes'),
+                                   options, timeout=timeout)
+        self._response = response
+        try:
+            for line in iter_lines(response, self.chunk_size, self.max_line):
+                yield parse_line(line)
+        finally:
+            response.close()
+            self._response = None
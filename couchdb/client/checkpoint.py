@@ -0,0 +1,231 @@
+"""Durable checkpoints for changes feed consumers.
+
+A checkpoint store remembers the update sequence a consumer has processed up
+to, so that it can resume from there after a restart. Stores only implement
+`load` and `save`; a `Checkpointer` in front of a store coalesces the writes.
+
+>>> store = LocalDocumentCheckpointStore(db, 'indexer')         # doctest: +SKIP
+>>> feed = db.changes_feed('normal', checkpoint=store)          # doctest: +SKIP
+>>> for change in feed:                                         # doctest: +SKIP
+...     index(change)                                           # doctest: +SKIP
+"""
+
+from .__common__ import *
+from .exceptions import CouchDBException
+import sqlite3
+import tempfile
+import threading
+
+
+class CheckpointStore(object):
+    """Base class of checkpoint stores."""
+
+    def load(self):
+        """Return the saved sequence, or `None` if there is none."""
+        raise NotImplementedError()
+
+    def save(self, seq):
+        """Durably save `seq`."""
+        raise NotImplementedError()
+
+
+class LocalDocumentCheckpointStore(CheckpointStore):
+    """Store the checkpoint in a ``_local`` document, which is not replicated.
+
+    :param db: the `Database` holding the document, which need not be the
+               database whose changes are consumed
+    :param id: the document ID, without the ``_local/`` prefix
+    """
+
+    def __init__(self, db, id):
+        self.db = db
+        self.id = id
+        self._rev = None
+
+    def __repr__(self):
+        return '<%s %r %r>' % (type(self).__name__, self.db.name, self.id)
+
+    @property
+    def url(self):
+        return urljoin(self.db.url, '_local', self.id)
+
+    def load(self):
+        response = self.db.session.get(self.url)
+        if response.status_code == 404:
+            return None
+        if not response.ok: raise CouchDBException.auto(response)
+        doc = response.json()
+        self._rev = doc.get('_rev')
+        return doc.get('seq')
+
+    def save(self, seq):
+        doc = {'seq': seq}
+        if self._rev is not None:
+            doc['_rev'] = self._rev
+        response = self.db.session.put(self.url, json=doc)
+        if response.status_code == 409:
+            # someone else wrote the checkpoint; ours is the latest progress
+            self.load()
+            doc['_rev'] = self._rev
+            response = self.db.session.put(self.url, json=doc)
+        if not response.ok: raise CouchDBException.auto(response)
+        self._rev = response.json().get('rev')
+
+
+class FileCheckpointStore(CheckpointStore):
+    """Store the checkpoint as JSON in a local file.
+
+    The file is replaced atomically: the checkpoint is written to a temporary
+    file next to it, synced to disk and renamed over the old one, and the
+    directory is synced too, so a crash leaves either the old or the new
+    checkpoint, never a partial one. Each save uses a temporary file of its
+    own, so several threads can save safely.
+
+    :param path: the path of the checkpoint file
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, self.path)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)['seq']
+        except FileNotFoundError:
+            return None
+
+    def save(self, seq):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path) + '.',
+                                   suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'seq': seq}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        _fsync_directory(directory)
+
+
+def _fsync_directory(path):
+    """Sync a directory, so that a file renamed into it survives a crash.
+    Where directories cannot be opened (on Windows), this does nothing.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Store the checkpoint in a row of an SQLite database, which can hold the
+    checkpoints of many consumers.
+
+    :param path: the path of the SQLite database file
+    :param key: the name of the consumer
+    :param table: the table holding the checkpoints, created if missing
+    """
+
+    def __init__(self, path, key='default', table='checkpoints'):
+        self.path = os.fspath(path)
+        self.key = key
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS "%s" '
+                               '(key TEXT PRIMARY KEY, seq TEXT NOT NULL)' % table)
+
+    def __repr__(self):
+        return '<%s %r %r>' % (type(self).__name__, self.path, self.key)
+
+    def load(self):
+        with self._lock:
+            row = self._conn.execute('SELECT seq FROM "%s" WHERE key = ?' % self.table,
+                                     (self.key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def save(self, seq):
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO "%s" (key, seq) VALUES (?, ?)' % self.table,
+                               (self.key, json.dumps(seq)))
+
+    def close(self):
+        self._conn.close()
+
+
+class Checkpointer(object):
+    """Coalesce the checkpoints of a consumer into occasional writes to a
+    `CheckpointStore`.
+
+    `update` is cheap and can be called after every change: the store is only
+    written once `every` updates or `interval` seconds have passed since the
+    last write. Call `flush` when the consumer stops to save the latest
+    sequence. A checkpointer is callable, so it can be passed as the
+    `checkpoint` of a `ChangesProcessor`.
+
+    :param store: the `CheckpointStore`
+    :param every: the number of updates after which the store is written
+    :param interval: the number of seconds after which the store is written
+                     on the next update
+    """
+
+    def __init__(self, store, every=1000, interval=5.0):
+        self.store = store
+        self.every = every
+        self.interval = interval
+        self.seq = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._saved_at = time.monotonic()
+
+    def __repr__(self):
+        return '<%s %r seq=%r>' % (type(self).__name__, self.store, self.seq)
+
+    def __call__(self, seq):
+        self.update(seq)
+
+    def load(self):
+        """Load the checkpoint from the store."""
+        self.seq = self.store.load()
+        return self.seq
+
+    def update(self, seq):
+        """Record that everything up to `seq` has been processed."""
+        with self._lock:
+            self.seq = seq
+            self._pending += 1
+            if (self._pending >= self.every
+                    or time.monotonic() - self._saved_at >= self.interval):
+                self._save()
+
+    def flush(self):
+        """Write the latest sequence if it has not been written yet."""
+        with self._lock:
+            if self._pending:
+                self._save()
+
+    def _save(self):
+        self.store.save(self.seq)
+        self._pending = 0
+        self._saved_at = time.monotonic()
+
+
+def as_checkpointer(checkpoint):
+    """Return `checkpoint` if it is a `Checkpointer` or a plain callable, or a
+    `Checkpointer` with the default settings for a `CheckpointStore`.
+    """
+    if isinstance(checkpoint, CheckpointStore):
+        return Checkpointer(checkpoint)
+    return checkpoint
@@ -0,0 +1,47 @@
+"""Client-side approximation of CouchDB's collation of JSON values.
+
+CouchDB orders values by type first -- ``null``, ``false``, ``true``,
+numbers, strings, arrays, objects -- and then by value. Arrays compare
+element by element and objects key by key, in document order. Strings are
+compared with the ICU Unicode Collation Algorithm on the server; here they
+are ordered case-insensitively first, with lowercase before uppercase on
+ties, which matches ICU for the common cases but not, for example, for
+punctuation or accented characters.
+
+>>> sorted(['b', 'B', 1, None, 'a', [1], 'A', True], key=collation_key)
+[None, True, 1, 'a', 'A', 'b', 'B', [1]]
+"""
+
+
+def _string_key(value):
+    return value.casefold(), value.swapcase(), value
+
+
+def collation_key(value):
+    """Return a key that sorts JSON values in CouchDB collation order."""
+    if value is None:
+        return (0,)
+    if value is False:
+        return (1,)
+    if value is True:
+        return (2,)
+    if isinstance(value, (int, float)):
+        return (3, value)
+    if isinstance(value, str):
+        return (4, _string_key(value))
+    if isinstance(value, (list, tuple)):
+        return (5, tuple(collation_key(item) for item in value))
+    if isinstance(value, dict):
+        return (6, tuple((_string_key(k), collation_key(v)) for k, v in value.items()))
+    raise TypeError('cannot collate %s' % type(value).__name__)
+
+
+def compare(a, b):
+    """Compare two JSON values in CouchDB collation order, returning a
+    negative number, zero or a positive number like ``cmp`` in Python 2.
+
+    >>> compare('a', 'B'), compare([1, 2], [1]), compare(1, 1.0)
+    (-1, 1, 0)
+    """
+    a, b = collation_key(a), collation_key(b)
+    return (a > b) - (a < b)
@@ -0,0 +1,208 @@
+"""Finding and resolving document conflicts in bulk."""
+
+from .__common__ import *
+from .document import Document
+from .changes import ChangesFeed
+import copy
+
+
+def keep_winner(winner, conflicts):
+    """The default merge function: keep the winning revision as it is and
+    only delete the conflicting ones.
+    """
+    return winner
+
+
+class ConflictResolver(object):
+    """Resolve the conflicts of many documents with a merge function, in
+    batches.
+
+    Conflicted documents are found in one of three ways, chosen with
+    `source`:
+
+    * ``'changes'`` reads ``_changes?style=all_docs``, whose entries list
+      every leaf revision, and picks the documents with more than one,
+    * ``'view'`` reads the IDs of the rows of the view `view`, which should
+      emit only conflicted documents (e.g. ``if (doc._conflicts) emit(null)``),
+    * ``'all_docs'`` scans every document with ``conflicts=true``.
+
+    For every batch of candidates the winning revisions (with their
+    ``_conflicts``) are read with one ``_all_docs`` request and the
+    conflicting revisions with one ``_bulk_get``. `merge` is called with
+    the winning `Document` and the list of conflicting ones and returns the
+    document to keep, or `None` to leave the document alone. The merged
+    documents that differ from their winners are written with one
+    ``_bulk_docs`` per batch, then the conflicting revisions of the documents
+    whose merged winner was written are deleted with another.
+
+    >>> def merge(winner, conflicts):
+    ...     winner['tags'] = sorted(set(t for d in [winner] + conflicts for t in d['tags']))
+    ...     return winner
+    >>> ConflictResolver(db, merge).run()                          # doctest: +SKIP
+    {'scanned': 5000, 'conflicted': 12, 'resolved': 12, ...}
+
+    :param db: the `Database`
+    :param merge: the merge function, by default `keep_winner`
+    :param source: ``'changes'``, ``'view'`` or ``'all_docs'``
+    :param view: the name of the view for the ``'view'`` source
+    :param batch_size: the number of candidate documents per batch
+    :param dry_run: compute the resolutions without writing them
+    """
+
+    def __init__(self, db, merge=None, source='changes', view=None, batch_size=100,
+                 dry_run=False):
+        if source not in ('changes', 'view', 'all_docs'):
+            raise ValueError('unknown source %r' % source)
+        if source == 'view' and view is None:
+            raise ValueError('the view source needs a view name')
+        self.db = db
+        self.merge = merge or keep_winner
+        self.source = source
+        self.view = view
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self._reset()
+
+    def __repr__(self):
+        return '<%s %r source=%s%s>' % (type(self).__name__, self.db.name, self.source,
+                                        ' dry_run' if self.dry_run else '')
+
+    def _reset(self):
+        self.scanned = 0
+        self.conflicted = 0
+        self.resolved = 0
+        self.revisions_deleted = 0
+        self.failures = 0
+        self.started = time.monotonic()
+
+    def stats(self) -> dict:
+        """Return the counters of the current or last run, with the number
+        of documents scanned per second.
+        """
+        elapsed = time.monotonic() - self.started
+        return {
+            'scanned': self.scanned,
+            'conflicted': self.conflicted,
+            'resolved': self.resolved,
+            'revisions_deleted': self.revisions_deleted,
+            'failures': self.failures,
+            'elapsed': elapsed,
+            'throughput': self.scanned / elapsed if elapsed else 0.0,
+            'dry_run': self.dry_run,
+        }
+
+    def run(self) -> dict:
+        """Resolve all the conflicts found.
+
+        :return: the `stats`
+        """
+        for _ in self.resolutions():
+            pass
+        return self.stats()
+
+    def resolutions(self):
+        """Iterate over the resolutions as they are applied (or, in dry-run
+        mode, computed).
+
+        The merged winners of a batch are written first, and the conflicting
+        revisions of a document are only deleted once its merged winner is
+        written. If the winner changed since it was read, its write fails and
+        the document is left conflicted, for a later pass to pick up.
+
+        :return: an iterator over ``(winner, conflicts, merged, writes)``
+                 tuples, `writes` being the documents written to resolve the
+                 conflict
+        """
+        self._reset()
+        for batch in self._candidates():
+            resolutions = []
+            for winner, conflicts in self._fetch(batch):
+                merged = self.merge(copy.deepcopy(winner), conflicts)
+                if merged is None:
+                    continue
+                update = None
+                if merged != winner:
+                    update = dict(merged, _id=winner.id, _rev=winner.rev)
+                deletions = [{'_id': doc.id, '_rev': doc.rev, '_deleted': True}
+                             for doc in conflicts]
+                resolutions.append((winner, conflicts, merged, update, deletions))
+            failed = set()
+            deleted = dict((winner.id, len(deletions))
+                           for winner, _, _, _, deletions in resolutions)
+            if not self.dry_run:
+                failed = self._write(r[3] for r in resolutions if r[3] is not None)
+                deleted = dict.fromkeys(deleted, 0)
+                deletions = [doc for winner, _, _, _, docs in resolutions
+                             if winner.id not in failed for doc in docs]
+                if deletions:
+                    for outcome in self.db.bulk_update(deletions):
+                        if 'error' not in outcome:
+                            deleted[outcome['id']] += 1
+            for winner, conflicts, merged, update, deletions in resolutions:
+                self.revisions_deleted += deleted[winner.id]
+                if winner.id in failed or deleted[winner.id] < len(deletions):
+                    # the document changed in the meantime; a later pass picks it up
+                    self.failures += 1
+                    continue
+                self.resolved += 1
+                yield winner, conflicts, merged, ([update] if update else []) + deletions
+
+    def _write(self, docs):
+        """Write the merged winners and return the IDs of those that failed"""
+        docs = list(docs)
+        if not docs:
+            return set()
+        return set(outcome['id'] for outcome in self.db.bulk_update(docs)
+                   if 'error' in outcome)
+
+    def _candidates(self):
+        """Iterate over lists of the IDs (or, for ``'all_docs'``, winning
+        revisions) of possibly conflicted documents.
+        """
+        if self.source == 'changes':
+            feed = ChangesFeed(self.db, 'normal', style='all_docs')
+            for changes in feed.batches(self.batch_size):
+                self.scanned += len(changes)
+                ids = [c['id'] for c in changes if len(c['changes']) > 1]
+                if ids:
+                    yield list(dict.fromkeys(ids))
+        elif self.source == 'view':
+            rows = self.db.iterview(self.view, self.batch_size)
+            while True:
+                ids = [row.id for row in itertools.islice(rows, self.batch_size)]
+                if not ids:
+                    return
+                self.scanned += len(ids)
+                yield list(dict.fromkeys(ids))
+        else:
+            rows = self.db.iterview('_all_docs', self.batch_size, include_docs=True,
+                                    conflicts=True)
+            while True:
+                docs = [row.doc for row in itertools.islice(rows, self.batch_size)]
+                if not docs:
+                    return
+                self.scanned += len(docs)
+                yield [doc for doc in docs if doc is not None and doc.get('_conflicts')]
+
+    def _fetch(self, batch):
+        """Return ``(winner, conflicts)`` pairs for the conflicted documents
+        of `batch`.
+        """
+        if batch and isinstance(batch[0], str):
+            rows = self.db.view('_all_docs', keys=batch, include_docs=True, conflicts=True)
+            batch = [row.doc for row in rows if row.doc is not None]
+        winners = [doc for doc in batch if doc.get('_conflicts')]
+        if not winners:
+            return []
+        self.conflicted += len(winners)
+        requests = [{'id': doc.id, 'rev': rev} for doc in winners for rev in doc['_conflicts']]
+        conflicts = {}
+        for result in self.db.bulk_get(requests):
+            for doc in result['docs']:
+                if 'ok' in doc:
+                    conflicts.setdefault(result['id'], []).append(Document(doc['ok']))
+        pairs = []
+        for winner in winners:
+            del winner['_conflicts']
+            pairs.append((winner, conflicts.get(winner.id, [])))
+        return pairs
@@ -1,9 +1,20 @@
 from .__common__ import *
 from .document import Document
-from .view import View, ViewResults
-from .find import Find
+from .view import View, ViewResults, PreparedView
+from .find import Find, Param, PreparedQuery, encode_query
+from .scan import ParallelViewScan, sample_split_points
+from .prefetch import Prefetcher
+from .changes import ChangesFeed, request_changes, iter_lines, parse_line
+from .processor import ChangesProcessor
+from .conflicts import ConflictResolver
+from .attachments import AttachmentStream, UploadStream, download
+from .multipart import iter_parts, parse_content_type, MultipartWriter
+from .hub import ChangesHub
+from .checkpoint import as_checkpointer
 from .exceptions import *
 from typing import Callable, Mapping, Iterable, Union
+from uuid import uuid4
+import base64
 
 class Database(object):
     """Representation of a database on a CouchDB server.
@@ -58,6 +69,8 @@ class Database(object):
         self.url = url
         self.session = session
         self._name = name
+        self._index_catalog = None
+        self._changes_hub = None
 
     def __repr__(self) -> str:
         return '<%s %r>' % (type(self).__name__, self.name)
@@ -316,36 +329,170 @@ class Database(object):
 
         :param id: the document ID
         :param default: the default value to return when the document is not found.
+        :param options: optional query string parameters, e.g. ``rev``,
+                        ``revs``, ``revs_info``, ``conflicts`` or
+                        ``deleted_conflicts``; use `open_revs` to fetch
+                        several revisions
         :return: a `Document` object representing the requested document, or `None`
                  if no document with the ID was found
         :rtype: `Document`
+        :raise ValueError: if ``open_revs`` is given
         """
+        if 'open_revs' in options:
+            raise ValueError('get() returns a single document; '
+                             'use open_revs() to fetch several revisions')
         try:
             self._validate_id(id)
         except NotFoundException:
             return default
-        response = self.session.get(urljoin(self.url, id))
+        response = self.session.get(urljoin(self.url, id), params=encode_params(options))
         if response.status_code == 404: return default
         if not response.ok: raise CouchDBException.auto(response)
         return Document(response.json())
 
+    def open_revs(self, id, revs='all', latest=False, attachments=False, **options):
+        """Fetch several revisions of a document in a single request.
+
+        All the leaf revisions are read with a ``GET`` of the document, while
+        a list of revisions is sent in the body of a ``POST`` to
+        ``_bulk_get`` so that it is not limited by the length of the URL.
+        With `attachments`, the content of every attachment is in the ``data``
+        member of its stub, as `bytes`; the leaf revisions then come as a
+        multipart stream that is parsed as it arrives, one revision at a time.
+
+        >>> [doc.rev for doc in db.open_revs('foo')]              # doctest: +SKIP
+        ['2-7051cbe5c8faecd085a3fa619e6e6337', '2-a2d1e9f3f0f8c2bc31b2fa7c70d4b2ac']
+
+        :param id: the document ID
+        :param revs: ``'all'`` for all the leaf revisions, or a list of
+                     revisions
+        :param latest: return the latest leaf of every requested revision
+        :param attachments: include the attachment data
+        :param options: further query string parameters, e.g.
+                        ``atts_since``, the only one supported with a list of
+                        revisions
+        :return: an iterator over the revisions as `Document` objects;
+                 revisions that are not available are left out
+        :raise TypeError: for other options with a list of revisions
+        """
+        self._validate_id(id)
+        if revs != 'all':
+            return self._open_revs_bulk(id, revs, latest, attachments, **options)
+        options.update(open_revs=revs, latest=latest or None,
+                       attachments=attachments or None)
+        headers = {'Accept': 'multipart/mixed' if attachments else 'application/json'}
+        response = self.session.get(urljoin(self.url, id), params=encode_params(options),
+                                    headers=headers, stream=attachments)
+        if not response.ok: raise CouchDBException.auto(response)
+        mimetype, params = parse_content_type(response.headers.get('Content-Type'))
+        if not mimetype.startswith('multipart/'):
+            results = [result['ok'] for result in response.json() if 'ok' in result]
+            return iter([Document(doc) for doc in results])
+        return self._iter_revs_multipart(response, params['boundary'])
+
+    def _open_revs_bulk(self, id, revs, latest, attachments, atts_since=None, **options):
+        if options:
+            raise TypeError('unsupported options for a list of revisions: %s' %
+                            ', '.join(sorted(options)))
+        docs = [{'id': id, 'rev': rev} for rev in revs]
+        if atts_since is not None:
+            for doc in docs:
+                doc['atts_since'] = atts_since
+        results = self.bulk_get(docs, latest=latest, attachments=attachments)
+        found = []
+        for result in results:
+            for item in result['docs']:
+                if 'ok' not in item:
+                    continue
+                doc = item['ok']
+                for stub in doc.get('_attachments', {}).values():
+                    if 'data' in stub:
+                        stub['data'] = base64.b64decode(stub['data'])
+                found.append(Document(doc))
+        return iter(found)
+
+    def _iter_revs_multipart(self, response, boundary):
+        try:
+            for headers, body in iter_parts(response.iter_content(64 * 1024), boundary):
+                mimetype, params = parse_content_type(headers.get('content-type'))
+                if mimetype == 'multipart/related':
+                    parts = iter_parts([body], params['boundary'])
+                    doc = json.loads(next(parts)[1])
+                    stubs = doc.get('_attachments', {})
+                    for att_headers, data in parts:
+                        name = parse_content_type(
+                            att_headers.get('content-disposition'))[1].get('filename')
+                        stub = stubs.get(name)
+                        if stub is not None:
+                            stub.pop('follows', None)
+                            stub['data'] = data
+                else:
+                    doc = json.loads(body)
+                    if 'missing' in doc:
+                        continue
+                yield Document(doc)
+        finally:
+            response.close()
+
     def revisions(self, id, **options):
         """Generator to yield all available revisions of the given document.
 
+        The revision history is read with one request and the revisions
+        themselves are fetched together with a second one.
+
         :param id: the document ID
+        :param options: further `open_revs` arguments
         :return: an iterator over Document objects, each a different revision,
                  in reverse chronological order, if any were found
         """
         data = self.get(id, revs=True)
-
-        #TODO I don't know that the following code is correct with current version of CouchDB
+        if data is None:
+            return
         startrev = data['_revisions']['start']
-        for index, rev in enumerate(data['_revisions']['ids']):
-            options['rev'] = '%d-%s' % (startrev - index, rev)
-            revision = self.get(id, **options)
-            if revision is None:
+        revs = ['%d-%s' % (startrev - index, rev)
+                for index, rev in enumerate(data['_revisions']['ids'])]
+        found = dict((doc.rev, doc) for doc in self.open_revs(id, revs, **options))
+        for rev in revs:
+            if rev not in found:
+                # older revisions have been compacted away
                 return
-            yield revision
+            yield found[rev]
+
+    def conflicts(self, id, deleted=False, **options):
+        """Fetch the winning revision of a document together with its
+        conflicting revisions, in a single request.
+
+        The winner is picked like CouchDB does: the leaf revision that is not
+        deleted with the longest history, ties broken by the highest revision
+        hash.
+
+        :param id: the document ID
+        :param deleted: also return the deleted conflicting revisions
+        :param options: further `open_revs` arguments, e.g. ``attachments``
+        :return: a ``(winner, conflicts)`` tuple of the winning `Document` (or
+                 `None` if the document does not exist) and the list of the
+                 conflicting ones
+        """
+        leaves = list(self.open_revs(id, 'all', **options))
+        if not leaves:
+            return None, []
+        winner = max(leaves, key=_rev_order)
+        conflicts = [doc for doc in leaves if doc is not winner
+                     and (deleted or not doc.get('_deleted'))]
+        return winner, sorted(conflicts, key=_rev_order, reverse=True)
+
+    def resolve_conflicts(self, merge: Callable = None, **options) -> dict:
+        """Resolve the conflicts of all conflicted documents in batches.
+
+        :param merge: a callable taking the winning `Document` and the list of
+                      conflicting ones and returning the document to keep, or
+                      `None` to skip the document; by default the winner is
+                      kept and the conflicting revisions are deleted
+        :param options: further `ConflictResolver` arguments, e.g. ``source``,
+                        ``batch_size`` or ``dry_run``
+        :return: the statistics of the run
+        """
+        return ConflictResolver(self, merge, **options).run()
 
     def info(self, ddoc=None):
         """Return information about the database or design document as a
@@ -386,56 +533,104 @@ class Database(object):
         :since: 0.4.1
         """
         url = urljoin(self.url, doc['_id'], filename)
-        response = self.session.get(url, params={'rev': doc['_rev']})
+        response = self.session.delete(url, params={'rev': doc['_rev']})
         if not response.ok: raise CouchDBException.auto(response)
         data = response.json()
         doc['_rev'] = data['rev']
 
-    def get_attachment(self, id_or_doc, filename, default=None):
+    def get_attachment(self, id_or_doc, filename, default=None, verify=True):
         """Return an attachment from the specified doc id and filename.
 
+        The content is not read up front: the returned file-like object
+        streams it from the connection as it is read, and checks its MD5
+        digest once the end is reached.
+
         :param id_or_doc: either a document ID or a dictionary or `Document`
                           object representing the document that the attachment
-                          belongs to
+                          belongs to; if it has a ``_rev``, the attachment of
+                          that revision is returned
         :param filename: the name of the attachment file
         :param default: default value to return when the document or attachment
                         is not found
-        :return: a file-like object with read and close methods, or the value
+        :param verify: check the digest of the content, raising a
+                       `CouchDBException` at the end of the content if it does
+                       not match
+        :return: an `AttachmentStream` with read and close methods, or the value
                  of the `default` argument if the attachment is not found
         :since: 0.4.1
         """
+        params = {}
+        digest = None
         if isinstance(id_or_doc, util.strbase):
             id = id_or_doc
         else:
             id = id_or_doc['_id']
-        
+            if id_or_doc.get('_rev'):
+                # the stub's digest is only valid for the document's revision
+                params['rev'] = id_or_doc['_rev']
+                stub = id_or_doc.get('_attachments', {}).get(filename, {})
+                digest = stub.get('digest')
+
         url = urljoin(self.url, id, filename)
-        response = self.session.get(url)
-        if response.status_code == 404 and default is not None: return default
+        response = self.session.get(url, params=params, stream=True)
+        if response.status_code == 404:
+            response.close()
+            return default
         if not response.ok: raise CouchDBException.auto(response)
-        return response.json()
+        return AttachmentStream(response, digest, verify)
+
+    def download_attachment(self, id_or_doc, filename, dest, verify=True) -> int:
+        """Download an attachment to a file, chunk by chunk.
 
-    def put_attachment(self, doc, content, filename=None, content_type=None):
+        :param id_or_doc: either a document ID or a dictionary or `Document`
+                          object representing the document that the attachment
+                          belongs to
+        :param filename: the name of the attachment file
+        :param dest: the path of the file to write, which is only replaced
+                     once the download is complete and verified, or a
+                     writable file-like object
+        :param verify: check the digest of the content
+        :return: the number of bytes written
+        :raise NotFoundException: if the attachment does not exist
+        """
+        stream = self.get_attachment(id_or_doc, filename, verify=verify)
+        if stream is None:
+            raise NotFoundException('not_found', 'attachment %r not found' % filename)
+        return download(stream, dest)
+
+    def put_attachment(self, doc, content, filename=None, content_type=None, progress=None):
         """Create or replace an attachment.
 
         Note that the provided `doc` is required to have a ``_rev`` field. Thus,
         if the `doc` is based on a view row, the view row would need to include
         the ``_rev`` field.
 
+        File objects, paths and buffers are streamed: the content is read and
+        sent a block at a time with a ``Content-Length`` header (unless the
+        size of a file cannot be determined), so memory use does not grow with
+        the size of the attachment.
+
         :param doc: the dictionary or `Document` object representing the
                     document that the attachment should be added to
-        :param content: the content to upload, either a file-like object or
-                        a string
+        :param content: the content to upload, either a binary file-like
+                        object, a path (`os.PathLike`) of a file, a buffer
+                        such as ``bytes``, ``mmap`` or ``memoryview``, or a
+                        string
         :param filename: the name of the attachment file; if omitted, this
                          function tries to get the filename from the file-like
-                         object passed as the `content` argument value
+                         object or path passed as the `content` argument value
         :param content_type: content type of the attachment; if omitted, the
                              MIME type is guessed based on the file name
                              extension
+        :param progress: a callable receiving the number of bytes sent so far
+                         and the total size (or `None` if unknown) as the
+                         upload proceeds
         :since: 0.4.1
         """
         if filename is None:
-            if hasattr(content, 'name'):
+            if isinstance(content, os.PathLike):
+                filename = os.path.basename(content)
+            elif hasattr(content, 'name'):
                 filename = os.path.basename(content.name)
             else:
                 raise ValueError('no filename specified for attachment')
@@ -444,23 +639,110 @@ class Database(object):
                 filter(None, mimetypes.guess_type(filename))
             )
 
-        url = urljoin(self.url, doc['_id'], filename)
-        response = self.session.put(
-            url, 
-            content, 
-            headers={
-                'Content-Type': content_type
-            },
-            params={
-                'rev': doc['_rev']
-            }
-        )
-        
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        opened = None
+        if isinstance(content, os.PathLike):
+            content = opened = open(content, 'rb')
+        try:
+            body = UploadStream(content, progress=progress)
+            if body.length == 0:
+                body = b''
+
+            url = urljoin(self.url, doc['_id'], filename)
+            response = self.session.put(
+                url,
+                body,
+                headers={
+                    'Content-Type': content_type
+                },
+                params={
+                    'rev': doc['_rev']
+                }
+            )
+        finally:
+            if opened is not None:
+                opened.close()
+
         if not response.ok: raise CouchDBException.auto(response)
         data = response.json()
         doc['_rev'] = data['rev']
 
-    def find(self, mango_query, wrapper=None, auto_paginate=False):
+    def save_with_attachments(self, doc: Mapping, files: Mapping, progress=None) -> (str, str):
+        """Create or update a document together with new attachments, in a
+        single ``multipart/related`` request.
+
+        The document is sent as the first part, with a ``follows`` stub for
+        every attachment in `files`, and the attachments follow as raw parts,
+        streamed from their files and buffers rather than inlined as base64.
+        Attachments the document already has are kept, like with `save`.
+
+        >>> db.save_with_attachments({'_id': 'report'},           # doctest: +SKIP
+        ...                          {'report.pdf': pathlib.Path('report.pdf'),
+        ...                           'summary.txt': ('Looks fine', 'text/plain')})
+        ('report', '1-...')
+
+        :param doc: the document to store; if it has no ``_id``, a random one
+                    is generated
+        :param files: a mapping of attachment names to their content, or to
+                      ``(content, content_type)`` pairs; the content can be
+                      anything `put_attachment` accepts, but the size of files
+                      must be known. If the content type is omitted, it is
+                      guessed based on the file name extension
+        :param progress: a callable receiving the number of bytes sent so far
+                         and the total size of the request body
+        :return: (id, rev) tuple of the saved document
+        """
+        id = doc.get('_id') or uuid4().hex
+        # CouchDB matches the parts to the ``follows`` stubs in order
+        attachments = dict((name, stub) for name, stub in (doc.get('_attachments') or {}).items()
+                           if name not in files)
+        opened = []
+        try:
+            parts = []
+            for filename, content in files.items():
+                content_type = None
+                if isinstance(content, tuple):
+                    content, content_type = content
+                if content_type is None:
+                    content_type = ';'.join(
+                        filter(None, mimetypes.guess_type(filename))
+                    ) or 'application/octet-stream'
+                if isinstance(content, str):
+                    content = content.encode('utf-8')
+                if isinstance(content, os.PathLike):
+                    content = open(content, 'rb')
+                    opened.append(content)
+                body = UploadStream(content)
+                if body.length is None:
+                    raise ValueError('the size of attachment %r is unknown' % filename)
+                attachments[filename] = {'follows': True, 'content_type': content_type,
+                                         'length': body.length}
+                parts.append(({'Content-Type': content_type}, body))
+            document = dict(doc, _id=id, _attachments=attachments)
+            parts.insert(0, ({'Content-Type': 'application/json'},
+                             json.dumps(document).encode('utf-8')))
+            body = MultipartWriter(parts, progress)
+            response = self.session.put(urljoin(self.url, id), body,
+                                        headers={'Content-Type': body.content_type})
+        finally:
+            for f in opened:
+                f.close()
+
+        if not response.ok: raise CouchDBException.auto(response)
+        data = response.json()
+        doc['_id'] = data['id']
+        doc['_rev'] = data['rev']
+        # keep the attachments as stubs, so that saving the document again
+        # does not remove them
+        doc['_attachments'] = dict(
+            (name, dict(((k, v) for k, v in stub.items() if k not in ('follows', 'data')),
+                        stub=True))
+            for name, stub in attachments.items())
+        return data['id'], data['rev']
+
+    def find(self, mango_query, wrapper=None, auto_paginate=False, prefetch=0, page_size=None,
+             fields=None):
         """Execute a mango find-query against the database.
 
         Note: only available for CouchDB version >= 2.0.0
@@ -483,13 +765,25 @@ class Database(object):
         >>> del server['python-tests']
 
         :param mango_query: a dictionary describing criteria used to select
-                            documents
+                            documents, or a `BoundQuery` from `prepare_find`
         :param wrapper: an optional callable that should be used to wrap the
                         resulting documents
         :param auto_paginate: If True, abstract the process of paging through the results.
                               This will result in multiple calls to the database server if
-                              there are more results than the limit specified in the query.
+                              there are more results than the limit specified in the query;
+                              pagination stops at the first page with fewer results.
                               (CouchDB's default limit is 25 if you do not specify a limit.)
+        :param prefetch: When auto-paginating, the number of pages to request ahead in
+                         the background while the current page is being consumed.
+                         0 disables prefetching. The background thread stops once
+                         the last page is consumed or the iteration is abandoned.
+        :param page_size: When auto-paginating, an optional `AdaptivePageSize` that
+                          adjusts the ``limit`` of each page toward a target latency
+                          or response size. By default every page uses the query's
+                          ``limit``.
+        :param fields: A list of fields to project the results to, overriding the
+                       query's ``fields``. Pass `True` to project to the fields
+                       the `wrapper` class declares (see `wrapper_fields`).
         :return: the query results as a `Find` iterable object
         """
         find = Find(
@@ -498,6 +792,9 @@ class Database(object):
             wrapper = wrapper, 
             session = self.session, 
             auto_paginate = auto_paginate, 
+            prefetch = prefetch,
+            page_size = page_size,
+            fields = fields,
         )
         if auto_paginate: 
             return find # Allow the iterable to auto-paginate
@@ -524,16 +821,196 @@ class Database(object):
         >>> del server['python-tests']
 
         :param mango_query: a `dict` describing criteria used to select
-                            documents
-        :return: the query results as a list of `Document` (or whatever
-                 `wrapper` returns)
+                            documents, or a `BoundQuery`
+        :return: the query plan
         :rtype: `dict`
         """
-        response = self.session.post(urljoin(self.url, '_explain'), mango_query)
+        response = self.session.post(
+            urljoin(self.url, '_explain'), 
+            data = encode_query(mango_query), 
+            headers = {'Content-Type': 'application/json'}
+        )
         if not response.ok: raise CouchDBException.auto(response)
         return response.json()
 
+    def get_fields(self, ids, fields, wrapper=None, chunk_size=500):
+        """Fetch only some fields of the documents with the given IDs.
+
+        The documents are read with ``_find`` queries on ``_id`` with an
+        ``$in`` operator and a ``fields`` projection, so only the requested
+        fields are transferred and decoded. Long ID lists are split into
+        chunks of `chunk_size` IDs per request.
+
+        :param ids: an iterable of document IDs
+        :param fields: the fields to return; ``_id`` is always included
+        :param wrapper: an optional callable that should be used to wrap the
+                        resulting documents
+        :param chunk_size: the maximum number of IDs per request
+        :return: a generator of `Document` objects (or whatever `wrapper`
+                 returns) in the order of `ids`; missing documents are skipped
+        """
+        fields = list(fields)
+        if '_id' not in fields:
+            fields.insert(0, '_id')
+        query = self.prepare_find({
+            'selector': {'_id': {'$in': Param('ids')}},
+            'fields': fields,
+            'limit': Param('limit'),
+        })
+        ids = iter(ids)
+        while True:
+            chunk = list(itertools.islice(ids, chunk_size))
+            if not chunk:
+                return
+            find = Find(urljoin(self.url, '_find'), query(ids=chunk, limit=len(chunk)), session=self.session)
+            docs = dict((doc['_id'], doc) for doc in find.execute())
+            for id in chunk:
+                if id in docs:
+                    yield wrapper(docs[id]) if wrapper is not None else docs[id]
+
+    def prepare_find(self, template) -> PreparedQuery:
+        """Prepare a parameterized Mango query for repeated execution.
+
+        The constant parts of the query are serialized to JSON once; `Param`
+        placeholders mark the values that change between executions.
+
+        >>> by_type = db.prepare_find({'selector': {'type': Param('type')},
+        ...                            'limit': 100})         # doctest: +SKIP
+        >>> for doc in db.find(by_type(type='Person')):         # doctest: +SKIP
+        ...     print(doc['name'])                              # doctest: +SKIP
+
+        :param template: the Mango query, with `Param` objects in place of the
+                         variable values
+        :return: a `PreparedQuery`; call it with the parameter values to get a
+                 query that can be passed to `find` and `explain`
+        """
+        return PreparedQuery(template)
+
+    def indexes(self, refresh=False):
+        """Return the Mango indexes of the database.
+
+        The list is fetched from the server once and then cached; pass
+        ``refresh=True`` to fetch it again. Indexes created with
+        `ensure_indexes` are added to the cached list.
 
+        :param refresh: ignore the cached index catalog
+        :return: a list of index descriptions as returned by ``GET _index``
+        :rtype: `list`
+        """
+        if self._index_catalog is None or refresh:
+            response = self.session.get(urljoin(self.url, '_index'))
+            if not response.ok: raise CouchDBException.auto(response)
+            self._index_catalog = response.json()['indexes']
+        return self._index_catalog
+
+    def ensure_indexes(self, definitions, wait=False, timeout=None):
+        """Create the Mango indexes in `definitions` that do not exist yet.
+
+        Each definition is a `dict` in the format of a ``POST _index`` request
+        body, e.g. ``{'index': {'fields': ['type']}, 'ddoc': 'by-type'}``.
+        Definitions are compared to the index catalog (see `indexes`) by
+        content: type, fields and partial filter selector, and the ``ddoc``
+        and ``name`` if the definition specifies them. Only the missing
+        indexes are posted, so calling this on every start of a service does
+        not cause any index rebuilds.
+
+        :param definitions: an iterable of index definitions
+        :param wait: if `True`, wait until the created JSON indexes are built
+        :param timeout: the maximum number of seconds to wait for index builds
+        :return: a list with one ``{'result', 'id', 'name'}`` dict per
+                 definition, as returned by ``POST _index``; ``result`` is
+                 ``'exists'`` for indexes that were already in the catalog
+        :rtype: `list`
+        """
+        catalog = [(_index_key(idx['type'], idx['def']), idx) for idx in self.indexes()]
+        results = []
+        created = []
+        for definition in definitions:
+            key = _index_key(definition.get('type', 'json'), definition['index'])
+            existing = next((idx for k, idx in catalog if k == key and _index_matches_name(idx, definition)), None)
+            if existing is not None:
+                results.append({'result': 'exists', 'id': existing['ddoc'], 'name': existing['name']})
+                continue
+            response = self.session.post(urljoin(self.url, '_index'), json=definition)
+            if not response.ok: raise CouchDBException.auto(response)
+            result = response.json()
+            results.append(result)
+            entry = {
+                'ddoc': result['id'],
+                'name': result['name'],
+                'type': definition.get('type', 'json'),
+                'def': dict(definition['index'], fields=_normalize_index_fields(definition['index']['fields'])),
+            }
+            if result['result'] == 'created':
+                created.append(entry)
+            self._index_catalog.append(entry)
+            catalog.append((key, entry))
+
+        if wait:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            for entry in created:
+                if entry['type'] == 'json':
+                    self._wait_for_index(entry, deadline)
+        return results
+
+    def _wait_for_index(self, index, deadline):
+        """Block until a JSON index is built by querying through it.
+
+        Mango queries bring the index up to date before answering, so a
+        query forced to use the index returns once the build is complete.
+        Requests that time out on either side are retried until `deadline`.
+        """
+        fields = [next(iter(field)) for field in index['def']['fields']]
+        query = {
+            'selector': dict((field, {'$gt': None}) for field in fields),
+            'use_index': [index['ddoc'], index['name']],
+            'limit': 1,
+        }
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise CouchDBException('timeout', 'index %s/%s was not built in time' % (index['ddoc'], index['name']))
+            try:
+                response = self.session.post(urljoin(self.url, '_find'), json=query, timeout=remaining)
+            except requests.Timeout:
+                continue
+            if response.ok:
+                return
+            if response.status_code < 500: raise CouchDBException.auto(response)
+            time.sleep(1)
+
+
+
+    def bulk_get(self, docs, revs=False, latest=False, attachments=False) -> list:
+        """Fetch many documents, or specific revisions of them, in a single
+        request to ``_bulk_get``.
+
+        >>> results = db.bulk_get(['a', {'id': 'b', 'rev': '2-7051cbe5'}])  # doctest: +SKIP
+        >>> results[0]['docs'][0]['ok']['_id']                              # doctest: +SKIP
+        'a'
+
+        :param docs: document IDs, or dicts with an ``id`` and optionally a
+                     ``rev`` (or ``atts_since``) member
+        :param revs: include the revision history of every document
+        :param latest: return the latest leaf revision instead of a requested
+                       revision that has been superseded
+        :param attachments: include the attachment data, base64 encoded;
+                            ``atts_since`` revisions in `docs` leave out the
+                            attachments present in those revisions
+        :return: the ``results`` of the response, one per requested document,
+                 each holding a ``docs`` list of ``{"ok": doc}`` or
+                 ``{"error": {...}}`` objects
+        :rtype: ``list``
+        """
+        docs = [{'id': doc} if isinstance(doc, str) else doc for doc in docs]
+        params = {}
+        if revs: params['revs'] = 'true'
+        if latest: params['latest'] = 'true'
+        if attachments: params['attachments'] = 'true'
+        response = self.session.post(urljoin(self.url, '_bulk_get'), json={'docs': docs},
+                                     params=params)
+        if not response.ok: raise CouchDBException.auto(response)
+        return response.json()['results']
 
     def bulk_update(self, documents, **options):
         """Perform a bulk update or insertion of the given documents using a
@@ -584,10 +1061,55 @@ class Database(object):
 
         content = options
         content.update(docs=docs)
-        response = self.session.post('_bulk_docs', content)
+        response = self.session.post(urljoin(self.url, '_bulk_docs'), json=content)
         if not response.ok: raise CouchDBException.auto(response)
         return response.json()
 
+    def revs_diff(self, revs: Mapping[str, list], chunk_size=1000) -> dict:
+        """Find out which of the given revisions are missing from the
+        database.
+
+        Only revision IDs are sent and received, so this is a cheap way to
+        tell what another database would have to send over. Large mappings are
+        split into requests of `chunk_size` documents each.
+
+        >>> db.revs_diff({'doc': ['1-967a00dff5e02add41819138abb3284d']})  # doctest: +SKIP
+        {'doc': {'missing': ['1-967a00dff5e02add41819138abb3284d']}}
+
+        :param revs: a mapping of document IDs to lists of revisions
+        :param chunk_size: the maximum number of documents per request
+        :return: a mapping of the IDs of documents with missing revisions to
+                 dicts with the ``missing`` revisions and, if any, the
+                 ``possible_ancestors`` present in the database
+        :rtype: ``dict``
+        """
+        return self._post_chunked('_revs_diff', revs, chunk_size)
+
+    def missing_revs(self, revs: Mapping[str, list], chunk_size=1000) -> dict:
+        """Find out which of the given revisions are missing from the
+        database, like `revs_diff` but without the possible ancestors.
+
+        :param revs: a mapping of document IDs to lists of revisions
+        :param chunk_size: the maximum number of documents per request
+        :return: a mapping of the IDs of documents with missing revisions to
+                 the lists of those revisions
+        :rtype: ``dict``
+        """
+        return self._post_chunked('_missing_revs', revs, chunk_size, 'missing_revs')
+
+    def _post_chunked(self, endpoint, revs, chunk_size, key=None):
+        url = urljoin(self.url, endpoint)
+        items = iter(revs.items())
+        result = {}
+        while True:
+            chunk = dict(itertools.islice(items, chunk_size))
+            if not chunk:
+                return result
+            response = self.session.post(url, json=chunk)
+            if not response.ok: raise CouchDBException.auto(response)
+            data = response.json()
+            result.update(data[key] if key is not None else data)
+
     def purge(self, docs):
         """Perform purging (complete removing) of the given documents.
 
@@ -630,15 +1152,31 @@ class Database(object):
         :param options: optional query string parameters
         :return: the view results
         """
+        return View(self._view_url(name), wrapper, self.session)(**options)
+
+    def prepare_view(self, name: Union[str, tuple], wrapper: Callable = None, **options) -> PreparedView:
+        """Prepare a view for repeated queries with the same `options`.
+
+        The view URL and the constant options are encoded once; calling the
+        returned `PreparedView` with the remaining options (such as ``key`` or
+        ``keys``) returns `ViewResults` like `view` does.
+
+        :param name: the name of the view, as for `view`
+        :param wrapper: an optional callable that should be used to wrap the
+                        result rows
+        :param options: the query string parameters shared by all calls
+        :return: the prepared view
+        """
+        return PreparedView(self._view_url(name), wrapper, self.session, **options)
+
+    def _view_url(self, name: Union[str, tuple]) -> str:
         if isinstance(name, str):
-            url = urljoin(self.url, name)
-        else:
-            # tuple for custom view
-            url = urljoin(self.url, '_design', name[0], '_view', *name[1:])
-        return View(url, wrapper, self.session)(**options)
+            return urljoin(self.url, name)
+        # tuple for custom view
+        return urljoin(self.url, '_design', name[0], '_view', *name[1:])
         
 
-    def iterview(self, name, batch, wrapper=None, **options):
+    def iterview(self, name, batch, wrapper=None, prefetch=0, **options):
         """Iterate the rows in a view, fetching rows in batches and yielding
         one row at a time.
 
@@ -646,6 +1184,10 @@ class Database(object):
         documents added, changed or deleted between requests may be missed or
         repeated.
 
+        With `prefetch` set, the following batches are requested on a
+        background thread while the current batch is being consumed, so at
+        most ``prefetch + 1`` batches are held in memory at any time.
+
         :param name: the name of the view; for custom views, use the format
                      ``design_docid/viewname``, that is, the document ID of the
                      design document and the name of the view, separated by a
@@ -653,9 +1195,92 @@ class Database(object):
         :param batch: number of rows to fetch per HTTP request.
         :param wrapper: an optional callable that should be used to wrap the
                         result rows
+        :param prefetch: number of batches to fetch ahead in the background;
+                         0 disables prefetching
         :param options: optional query string parameters
         :return: row generator
         """
+        if not prefetch:
+            batches = self._iterview_batches(name, batch, wrapper, options)
+            session = None
+        else:
+            # the background thread gets a connection pool of its own
+            session = clone_session(self.session)
+            db = type(self)(self.url, self._name, session)
+            batches = Prefetcher(db._iterview_batches(name, batch, wrapper, options), prefetch)
+        try:
+            for rows, count in batches:
+                for row in itertools.islice(rows, count):
+                    yield row
+        finally:
+            batches.close()
+            if session is not None:
+                session.close()
+
+    def iterview_numpy(self, name, batch, key_dtype=None, value_dtype=None,
+                       id_dtype=None, **options):
+        """Iterate the rows in a view in batches, yielding each batch as a
+        dictionary of NumPy arrays.
+
+        Rows are never turned into `Row` objects: each batch is converted
+        column by column, with the same layout and dtype arguments as
+        `ViewResults.to_numpy`. Requires NumPy.
+
+        :param name: the name of the view, as for `iterview`
+        :param batch: number of rows to fetch per HTTP request
+        :param options: optional query string parameters
+        :return: generator of ``dict`` objects mapping column names to arrays
+        """
+        from .arrays import columns_to_numpy
+        for rows, count in self._iterview_batches(name, batch, None, options):
+            yield columns_to_numpy(rows, key_dtype, value_dtype, id_dtype, count)
+
+    def parallel_view(self, name, partitions=4, split_points=None, batch=1000,
+                      workers=None, ordered=False, wrapper=None, **options):
+        """Scan a view with several concurrent requests, one per key range.
+
+        The key space is split into ranges either at the given `split_points`
+        or, if omitted, at points found by sampling the view (see
+        `sample_split_points`). Each range is then read in batches like
+        `iterview`, on its own connection.
+
+        >>> for row in db.parallel_view('_all_docs', partitions=8):  # doctest: +SKIP
+        ...     process(row)
+
+        :param name: the name of the view, as for `view`
+        :param partitions: the number of ranges to sample for when no
+                           `split_points` are given
+        :param split_points: keys (or ``(key, docid)`` tuples) at which to
+                             split the view, in view order
+        :param batch: number of rows to fetch per HTTP request
+        :param workers: the maximum number of ranges scanned at the same time;
+                        defaults to the number of ranges
+        :param ordered: if `True`, yield rows in view order; otherwise rows
+                        are yielded in whatever order they arrive
+        :param wrapper: an optional callable that should be used to wrap the
+                        result rows
+        :param options: optional query string parameters (``limit`` is not
+                        supported)
+        :return: a `ParallelViewScan` iterable over the rows
+        """
+        if split_points is None:
+            split_points = sample_split_points(self, name, partitions, **options)
+        return ParallelViewScan(
+            self, name, split_points,
+            batch = batch,
+            workers = workers or len(split_points) + 1,
+            ordered = ordered,
+            wrapper = wrapper,
+            **options
+        )
+
+    def _iterview_batches(self, name, batch, wrapper, options):
+        """Fetch the rows of a view in batches for `iterview`.
+
+        Yields ``(rows, count)`` tuples, where only the first `count` rows of
+        each batch should be consumed; the extra row is fetched to find the
+        start of the next batch.
+        """
         # Check sane batch size.
         if batch <= 0:
             raise ValueError('batch must be 1 or more')
@@ -668,11 +1293,9 @@ class Database(object):
             loop_limit = min(limit or batch, batch)
             # Get rows in batches, with one extra for start of next batch.
             options['limit'] = loop_limit + 1
-            rows = list(self.view(name, wrapper, **options))
+            rows = self.view(name, wrapper, **options).rows
 
-            # Yield rows from this batch.
-            for row in itertools.islice(rows, loop_limit):
-                yield row
+            yield rows, min(len(rows), loop_limit)
 
             # Decrement limit counter.
             if limit is not None:
@@ -683,8 +1306,8 @@ class Database(object):
                 break
 
             # Update options with start keys for next loop.
-            options.update(startkey=rows[-1]['key'],
-                           startkey_docid=rows[-1]['id'], skip=0)
+            options.update(startkey=rows.keys[-1],
+                           startkey_docid=rows.ids[-1], skip=0)
 
     def show(self, name, docid=None, **options):
         """Call a 'show' function.
@@ -743,35 +1366,120 @@ class Database(object):
         return headers, body
 
     def _changes(self, **opts):
-        # use streaming `get` and `post` methods
-        if opts.get('filter') == '_selector':
-            selector = opts.pop('_selector', None)
-            _, _, data = self.resource.post('_changes', selector, **opts)
-        else:
-            _, _, data = self.resource.get('_changes', **opts)
-        lines = data.iterchunks()
-        for ln in lines:
-            if not ln: # skip heartbeats
-                continue
-            doc = json.decode(ln.decode('utf-8'))
-            if 'last_seq' in doc: # consume the rest of the response if this
-                for ln in lines:  # was the last line, allows conn reuse
-                    pass
-            yield doc
+        # stream a single response, including the final last_seq object
+        url = urljoin(self.url, '_changes')
+        response = request_changes(self.session, url, opts)
+        try:
+            for line in iter_lines(response):
+                doc = parse_line(line)
+                if doc is not None: # skip heartbeats
+                    yield doc
+        finally:
+            response.close()
 
     def changes(self, **opts):
         """Retrieve a changes feed from the database.
 
+        For ``feed='continuous'`` this returns a generator over the change
+        notifications of a single response, ending with the ``last_seq``
+        object. Otherwise the whole response is returned as a dictionary; use
+        `changes_feed` to stream large feeds instead.
+
         :param opts: optional query string parameters
         :return: an iterable over change notification dicts
         """
         if opts.get('feed') == 'continuous':
             return self._changes(**opts)
 
-        if opts.get('filter') == '_selector':
-            selector = opts.pop('_selector', None)
-            _, _, data = self.resource.post_json('_changes', selector, **opts)
-        else:
-            _, _, data = self.resource.get_json('_changes', **opts)
-        return data
+        response = request_changes(self.session, urljoin(self.url, '_changes'), opts, stream=False)
+        return response.json()
+
+    def changes_feed(self, feed='continuous', since=None, **options) -> ChangesFeed:
+        """Stream the changes feed of the database.
+
+        Unlike `changes`, the returned `ChangesFeed` reads the response
+        incrementally, reconnects from the last seen sequence when the
+        connection fails, and can group the changes in batches.
 
+        :param feed: ``'normal'``, ``'longpoll'`` or ``'continuous'``
+        :param since: the update sequence to start from
+        :param options: further `ChangesFeed` arguments and ``_changes`` query
+                        string parameters
+        :return: the changes feed, an iterable over change notification dicts
+        """
+        return ChangesFeed(self, feed, since, **options)
+
+    def changes_hub(self, **options) -> ChangesHub:
+        """Return the `ChangesHub` of this database object, which shares a
+        single continuous changes feed among any number of subscribers.
+
+        The hub is created on the first call, with the given `options`; later
+        calls return the same hub and ignore them, unless its feed has failed.
+
+        :param options: `ChangesHub` arguments
+        """
+        hub = self._changes_hub
+        if hub is None or hub.error is not None:
+            hub = self._changes_hub = ChangesHub(self, **options)
+        return hub
+
+    def process_changes(self, handler: Callable, workers=4, executor=None, checkpoint=None,
+                        max_pending=1000, feed='normal', since=None, **options):
+        """Handle the changes of the database in parallel.
+
+        Changes to different documents are passed to `handler` concurrently,
+        changes to the same document in feed order. `checkpoint` is called with
+        the sequence up to which every change has been handled, whenever it
+        advances; see `ChangesProcessor`.
+
+        :param handler: a callable taking one change
+        :param workers: the number of worker threads, if no `executor` is given
+        :param executor: a `concurrent.futures.Executor` to run `handler` in
+        :param checkpoint: a callable receiving the sequence up to which all
+                           changes have been handled, or a `CheckpointStore`
+                           or `Checkpointer` that processing also resumes from
+        :param max_pending: the maximum number of changes in flight
+        :param feed: the kind of changes feed; with ``'normal'`` processing
+                     ends at the current end of the feed
+        :param since: the update sequence to start from, by default the one
+                      loaded from `checkpoint`
+        :param options: further `changes_feed` arguments
+        :return: the sequence of the last change handled
+        """
+        checkpoint = as_checkpointer(checkpoint)
+        if since is None and hasattr(checkpoint, 'load'):
+            since = checkpoint.load()
+        changes = self.changes_feed(feed, since, **options)
+        processor = ChangesProcessor(changes, handler, workers, executor, checkpoint, max_pending)
+        return processor.run()
+
+def _rev_order(doc):
+    """Sort key of leaf revisions, the winning revision sorting last"""
+    pos, _, hash = doc['_rev'].partition('-')
+    return not doc.get('_deleted', False), int(pos), hash
+
+
+def _normalize_index_fields(fields):
+    """Convert index fields to the ``[{field: direction}]`` form CouchDB uses
+    in its index catalog.
+    """
+    return [{field: 'asc'} if isinstance(field, str) else field for field in fields]
+
+
+def _index_key(type, definition):
+    """Key identifying the content of an index definition"""
+    definition = dict(definition)
+    if 'fields' in definition:
+        definition['fields'] = _normalize_index_fields(definition['fields'])
+    if not definition.get('partial_filter_selector'):
+        definition.pop('partial_filter_selector', None)
+    return type, json.dumps(definition, sort_keys=True)
+
+
+def _index_matches_name(index, definition):
+    """Whether an index from the catalog has the ddoc and name a definition asks for"""
+    ddoc = definition.get('ddoc')
+    if ddoc is not None and index['ddoc'] != (ddoc if ddoc.startswith('_design/') else '_design/' + ddoc):
+        return False
+    name = definition.get('name')
+    return name is None or index['name'] == name
@@ -1,4 +1,8 @@
-from .find import Find
+from .find import Find, encode_query, wrapper_fields
 from .query import FindQuery
 from .iterator import FindIterator
-from .response import FindResponse
\ No newline at end of file
+from .response import FindResponse
+from .paging import AdaptivePageSize
+from .advisor import IndexAdvisor, IndexAdvice, suggest_index
+from .selector import compile_selector, SelectorError
+from .prepared import Param, PreparedQuery, BoundQuery
@@ -0,0 +1,221 @@
+import json
+from .query import FindQuery
+
+
+COMPARISON_OPERATORS = {'$gt', '$gte', '$lt', '$lte', '$ne', '$exists', '$type', '$regex', '$in', '$nin'}
+
+
+def _selector_fields(selector, prefix='', equality=None, ranges=None):
+    """Collect the fields a selector constrains, split into fields compared
+    for equality and fields constrained in any other way. Fields under
+    ``$or``/``$nor``/``$not`` are ignored since a JSON index cannot serve them.
+    """
+    if equality is None:
+        equality, ranges = [], []
+    for key, value in selector.items():
+        if key == '$and':
+            for sub in value:
+                _selector_fields(sub, prefix, equality, ranges)
+        elif key.startswith('$'):
+            continue
+        else:
+            field = prefix + key
+            if not isinstance(value, dict):
+                equality.append(field)
+            elif not any(k.startswith('$') for k in value):
+                _selector_fields(value, field + '.', equality, ranges)
+            else:
+                for op in value:
+                    if op == '$eq':
+                        equality.append(field)
+                    elif op in COMPARISON_OPERATORS:
+                        ranges.append(field)
+    return equality, ranges
+
+
+def _shape(value):
+    """Replace the literal values of a selector by their JSON type so that
+    queries differing only in their parameters are recorded together.
+    """
+    if isinstance(value, dict):
+        return dict((k, _shape(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_shape(v) for v in value]
+    return type(value).__name__
+
+
+def suggest_index(query) -> dict:
+    """Suggest a JSON ``_index`` definition for a Mango query.
+
+    Fields compared for equality come first, then the sort fields, then fields
+    constrained by ranges or other operators. Returns `None` if the selector
+    constrains no indexable field.
+    """
+    equality, ranges = _selector_fields(query['selector'])
+    sort = []
+    for item in query.get('sort') or ():
+        sort.append(item if isinstance(item, str) else next(iter(item)))
+    fields = []
+    for field in equality + sort + ranges:
+        if field not in fields:
+            fields.append(field)
+    if not fields:
+        return None
+    return {'index': {'fields': fields}, 'type': 'json'}
+
+
+class IndexAdvice:
+    """The analysis of one recorded query shape"""
+
+    def __init__(self, query, runs, explain, docs_examined, results_returned, doc_count):
+        self.query = query
+        self.runs = runs
+        self.explain = explain
+        self.docs_examined = docs_examined
+        self.results_returned = results_returned
+        self.suggested_index = suggest_index(query)
+        if docs_examined is None:
+            # Without execution stats, assume a full scan reads every document
+            self.estimated_cost = doc_count * runs if self.full_scan else 0
+        else:
+            self.estimated_cost = docs_examined * runs
+
+
+    def __repr__(self):
+        return '<%s %r cost=%r>' % (type(self).__name__, self.index_name, self.estimated_cost)
+
+
+    @property
+    def index_name(self) -> str:
+        """The name of the index CouchDB chose for the query"""
+        return self.explain['index']['name']
+
+
+    @property
+    def full_scan(self) -> bool:
+        """Whether the query is answered by scanning ``_all_docs``"""
+        return self.explain['index']['type'] == 'special'
+
+
+    @property
+    def ratio(self) -> float:
+        """Documents examined per document returned, on average per run, or
+        `None` if no execution statistics were recorded
+        """
+        if self.docs_examined is None:
+            return None
+        return self.docs_examined / max(self.results_returned, 1)
+
+
+class IndexAdvisor:
+    """Records the Mango queries an application runs and points out the ones
+    that are not served well by an index.
+
+    Queries are grouped by shape: two queries with the same selector, sort and
+    fields that only differ in their literal values count as the same query.
+    Run queries through `find` to record them together with their execution
+    statistics, or pass them to `record` directly.
+
+    >>> advisor = IndexAdvisor(db)                                  # doctest: +SKIP
+    >>> docs = advisor.find({'selector': {'type': 'Person'}})       # doctest: +SKIP
+    >>> print(advisor.report())                                     # doctest: +SKIP
+
+    :param db: the `Database` the queries run against
+    :param ratio_threshold: queries examining more than this many documents
+                            per returned document are flagged
+    """
+
+    def __init__(self, db, ratio_threshold: float = 10):
+        self.db = db
+        self.ratio_threshold = ratio_threshold
+        self._queries = {}
+
+
+    def __repr__(self):
+        return '<%s %r %d queries>' % (type(self).__name__, self.db, len(self._queries))
+
+
+    def __len__(self):
+        return len(self._queries)
+
+
+    def record(self, query, execution_stats=None):
+        """Record a query that was run, optionally with the ``execution_stats``
+        of its response.
+        """
+        shape = dict((k, v) for k, v in query.items() if k not in ('bookmark', 'execution_stats'))
+        shape['selector'] = _shape(query['selector'])
+        key = json.dumps(shape, sort_keys=True)
+        entry = self._queries.get(key)
+        if entry is None:
+            entry = self._queries[key] = {'query': query, 'runs': 0, 'examined': 0, 'returned': 0, 'stats': 0}
+        entry['runs'] += 1
+        if execution_stats:
+            entry['stats'] += 1
+            entry['examined'] += execution_stats.get('total_docs_examined', 0)
+            entry['returned'] += execution_stats.get('results_returned', 0)
+
+
+    def find(self, mango_query, wrapper=None, **options):
+        """Run a query with `Database.find`, recording it and its execution statistics.
+
+        Takes the same arguments as `Database.find`. Auto-paginated queries are
+        recorded without statistics.
+        """
+        query = FindQuery(**mango_query)
+        query.execution_stats = True
+        results = self.db.find(query, wrapper, **options)
+        self.record(mango_query, getattr(results, 'execution_stats', None))
+        return results
+
+
+    def analyze(self, flagged_only: bool = True):
+        """Explain every recorded query and rank them by estimated cost.
+
+        The cost of a query is the number of documents it examines, summed over
+        all its runs. Without execution statistics, queries scanning
+        ``_all_docs`` are assumed to examine the whole database.
+
+        :param flagged_only: only return queries that use ``_all_docs`` or examine
+                             more than `ratio_threshold` documents per result
+        :return: a list of `IndexAdvice`, most expensive first
+        """
+        doc_count = len(self.db)
+        advice = []
+        for entry in self._queries.values():
+            stats = entry['stats']
+            item = IndexAdvice(
+                entry['query'],
+                entry['runs'],
+                self.db.explain(entry['query']),
+                entry['examined'] / stats if stats else None,
+                entry['returned'] / stats if stats else None,
+                doc_count,
+            )
+            flagged = item.full_scan or (item.ratio is not None and item.ratio > self.ratio_threshold)
+            if flagged or not flagged_only:
+                advice.append(item)
+        advice.sort(key=lambda item: item.estimated_cost, reverse=True)
+        return advice
+
+
+    def report(self, flagged_only: bool = True) -> str:
+        """Format the result of `analyze` as a plain text table"""
+        header = ('#', 'cost', 'runs', 'index', 'examined/returned', 'suggested fields', 'selector')
+        lines = [header]
+        for rank, item in enumerate(self.analyze(flagged_only), 1):
+            suggested = item.suggested_index
+            lines.append((
+                str(rank),
+                str(int(item.estimated_cost)),
+                str(item.runs),
+                item.index_name,
+                '-' if item.ratio is None else '%.1f' % item.ratio,
+                ', '.join(suggested['index']['fields']) if suggested else '-',
+                json.dumps(item.query['selector'], sort_keys=True),
+            ))
+        widths = [max(len(line[i]) for line in lines) for i in range(len(header) - 1)]
+        return '\n'.join(
+            '  '.join(cell.ljust(width) for cell, width in zip(line, widths)) + '  ' + line[-1]
+            for line in lines
+        )
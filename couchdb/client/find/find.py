@@ -1,7 +1,14 @@
 from ..__common__ import requests
+import dataclasses
+import json
+import time
 from ..exceptions import *
 from .response import FindResponse
 from .query import FindQuery
+from .paging import AdaptivePageSize
+from .prepared import BoundQuery
+
+DEFAULT_PAGE_SIZE = 25 # CouchDB's default limit
 
 
 class Find:
@@ -11,31 +18,94 @@ class Find:
         query, 
         wrapper=None, 
         session: requests.Session = None,
-        auto_paginate: bool = False
+        auto_paginate: bool = False,
+        prefetch: int = 0,
+        page_size: AdaptivePageSize = None,
+        fields = None
         ):
+        if fields is True:
+            fields = wrapper_fields(wrapper)
+        if fields is not None:
+            if isinstance(query, BoundQuery):
+                raise TypeError('fields cannot be set on a prepared query, put them in its template')
+            query = FindQuery(**query)
+            query.fields = list(fields)
         self.query = query
         self.url = url
         self.wrapper = wrapper
         self.session = session or requests.Session()
         self.auto_paginate = auto_paginate
+        self.prefetch = prefetch
+        self.page_size = page_size
+    
+
+    @property
+    def limit(self) -> int:
+        """The number of documents requested per page when not adapting the page size"""
+        # read the attribute: a BoundQuery would encode itself to answer get()
+        limit = getattr(self.query, 'limit', None)
+        if limit is None and isinstance(self.query, dict):
+            limit = self.query.get('limit')
+        return limit or DEFAULT_PAGE_SIZE
     
 
     def __iter__(self):
-        return FindIterator(self)
+        iterator = FindIterator(self)
+        try:
+            yield from iterator
+        finally:
+            # stops prefetching when the iteration is abandoned
+            iterator.close()
 
 
-    def execute(self, bookmark=None) -> FindResponse:
-        if bookmark is None:
-            q = self.query
-        else:
-            q = FindQuery(**self.query)
-            q.bookmark = bookmark
-        
+    def execute(self, bookmark=None, limit=None) -> FindResponse:
+        """Run the query once and return a single page of results.
 
-        response = self.session.post(self.url, json=q, headers = {'Content-Type': 'application/json'})
-        if not response.ok: raise CouchDBException.auto(response.json())
+        :param bookmark: the bookmark of the page to fetch; the first page if omitted
+        :param limit: a page size overriding the query's ``limit``
+        """
+        start = time.monotonic()
+        response = self.session.post(
+            self.url, 
+            data = encode_query(self.query, bookmark, limit), 
+            headers = {'Content-Type': 'application/json'}
+        )
+        if not response.ok: raise CouchDBException.auto(response)
         data = response.json()
-        return FindResponse(data, self.wrapper)
+        results = FindResponse(data, self.wrapper, page_size = limit or self.limit)
+        results.elapsed = time.monotonic() - start
+        results.size = len(response.content)
+        return results
+
+
+def wrapper_fields(wrapper) -> list:
+    """Return the document fields a wrapper class declares, for use as a Mango
+    ``fields`` projection. Fields are taken from a ``_fields`` attribute (as on
+    schema-style document classes) or from the fields of a dataclass; ``_id``
+    and ``_rev`` are always included.
+    """
+    if dataclasses.is_dataclass(wrapper):
+        names = [field.name for field in dataclasses.fields(wrapper)]
+    elif getattr(wrapper, '_fields', None) is not None:
+        names = list(wrapper._fields)
+    else:
+        raise TypeError('%r does not declare its fields' % (wrapper,))
+    return ['_id', '_rev'] + [name for name in names if name not in ('_id', '_rev')]
+
+
+def encode_query(query, bookmark=None, limit=None) -> bytes:
+    """Serialize a Mango query to JSON, optionally with a bookmark and ``limit``
+    overriding those of the query. `query` is a `dict`, `FindQuery` or `BoundQuery`.
+    """
+    if isinstance(query, BoundQuery):
+        return query.encode(bookmark, limit)
+    if bookmark is not None or limit is not None:
+        query = FindQuery(**query)
+        if bookmark is not None:
+            query.bookmark = bookmark
+        if limit is not None:
+            query.limit = limit
+    return json.dumps(query).encode('utf-8')
 
 # This must be imported after the class definition because cyclical imports
 from .iterator import FindIterator
\ No newline at end of file
@@ -1,24 +1,81 @@
 from collections import deque
 from .find import Find
+from ..prefetch import Prefetcher
 
 
 class FindIterator:
+    """Iterate over the documents of a `Find`, page by page.
+
+    With prefetching, pages are requested on a background thread, which is
+    stopped once the last page is consumed. Call `close()`, or use the
+    iterator as a context manager, to stop it when iteration is abandoned
+    early; iterating over the `Find` itself does this automatically.
+    """
+
     def __init__(self, find: Find):
         self.find = find
         self.bookmark = None
         self.queue = deque()
+        self.has_next_page = True
+        self.closed = False
+        self.pages = self._pages()
+        if find.auto_paginate and find.prefetch:
+            # Request the following pages while this one is being consumed
+            self.pages = Prefetcher(self.pages, find.prefetch)
         self.fetch_more()
+
+
+    def _pages(self):
+        """Generator executing the query page by page, following bookmarks"""
+        bookmark = None
+        adaptive = self.find.page_size
+        limit = adaptive.initial if adaptive else None
+        while True:
+            results = self.find.execute(bookmark = bookmark, limit = limit)
+            yield results
+            if not (self.find.auto_paginate and results.has_next_page):
+                return
+            bookmark = results.bookmark
+            if adaptive:
+                limit = adaptive.next_size(limit, results.count, results.elapsed, results.size)
     
 
     def fetch_more(self):
         """Fetch more data from the server using the bookmark from the last call"""
-        results = self.find.execute(bookmark = self.bookmark)
+        try:
+            results = next(self.pages)
+        except StopIteration:
+            self.has_next_page = False
+            self.close()
+            return self
         self.bookmark = results.bookmark
         self.queue.extend(results.docs)
         self.has_next_page = results.has_next_page
+        if not (self.find.auto_paginate and self.has_next_page):
+            # the last page is here, so no more pages are fetched
+            self.close()
+        return self
+
+
+    def close(self):
+        """Stop fetching pages in the background"""
+        if not self.closed:
+            self.closed = True
+            self.pages.close()
+
+
+    def __enter__(self):
         return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
         
 
+    def __iter__(self):
+        return self
+
+
     def __next__(self):
         try:
             return self.queue.popleft()
@@ -29,8 +86,5 @@ class FindIterator:
                     return self.queue.popleft()
                 except IndexError:
                     pass
+        self.close()
         raise StopIteration()
-
-
-    
-
@@ -0,0 +1,51 @@
+class AdaptivePageSize:
+    """Page size policy for auto-paginated Mango queries that grows or shrinks
+    the ``limit`` of each request toward a target duration and/or response
+    size per page.
+
+    After every page the cost of a single document is estimated from the page
+    that just arrived, and the next page is sized so that it should take about
+    `target_seconds` and/or `target_bytes`. The size changes by at most
+    `factor` per page and is kept between `minimum` and `maximum`.
+    """
+
+    def __init__(
+        self, 
+        initial: int = 25, 
+        target_seconds: float = None, 
+        target_bytes: int = None, 
+        minimum: int = 1, 
+        maximum: int = 10000, 
+        factor: float = 2.0
+        ):
+        if target_seconds is None and target_bytes is None:
+            raise ValueError('target_seconds or target_bytes must be given')
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError('expected minimum <= initial <= maximum')
+        self.initial = initial
+        self.target_seconds = target_seconds
+        self.target_bytes = target_bytes
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+    
+
+    def __repr__(self):
+        return '<%s %d..%d>' % (type(self).__name__, self.minimum, self.maximum)
+
+
+    def next_size(self, size: int, count: int, seconds: float, nbytes: int) -> int:
+        """Return the page size to request after a page of `size` was answered
+        with `count` documents in `seconds`, with a body of `nbytes`.
+        """
+        if count <= 0:
+            return size
+        ideal = []
+        if self.target_seconds is not None and seconds > 0:
+            ideal.append(self.target_seconds * count / seconds)
+        if self.target_bytes is not None and nbytes > 0:
+            ideal.append(self.target_bytes * count / nbytes)
+        if not ideal:
+            return size
+        new_size = max(size / self.factor, min(size * self.factor, min(ideal)))
+        return int(max(self.minimum, min(self.maximum, new_size)))
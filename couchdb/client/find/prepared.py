@@ -0,0 +1,166 @@
+import json
+from json.encoder import encode_basestring_ascii
+import re
+import uuid
+
+
+_encode = json.JSONEncoder().encode
+
+
+def _encode_value(value) -> str:
+    """JSON-encode a bound value, skipping the encoder setup for plain strings and ints"""
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    if type(value) is int:
+        return int.__repr__(value)
+    return _encode(value)
+
+
+class Param:
+    """Placeholder for a value in a `PreparedQuery` template, bound by name when
+    the query is executed.
+
+    >>> query = PreparedQuery({'selector': {'type': Param('type')}, 'limit': 10})
+    >>> query(type='Person').encode()
+    b'{"limit": 10, "selector": {"type": "Person"}}'
+    """
+
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.name)
+
+
+class PreparedQuery:
+    """A Mango query template whose constant parts are serialized to JSON once.
+
+    Parts of the template that change between executions are marked with `Param`
+    placeholders, anywhere in the query. Calling the prepared query (or `bind`)
+    with values for the parameters returns a `BoundQuery`, which can be passed
+    to `Database.find` (including auto-pagination) and `Database.explain` in
+    place of a `FindQuery`. Executing a bound query only serializes the bound
+    values and splices them between the pre-serialized constant parts.
+
+    The ``limit`` may be a parameter too; ``bookmark`` is not part of a
+    template since it is set by pagination.
+    """
+
+    def __init__(self, template):
+        template = dict(template)
+        if 'selector' not in template:
+            raise ValueError('a query template needs a selector')
+        template.pop('bookmark', None)
+        self.limit = template.pop('limit', None)
+        self.template = template
+        token = uuid.uuid4().hex
+        names = []
+
+        def substitute(value):
+            if isinstance(value, Param):
+                names.append(value.name)
+                return '%s:%d' % (token, len(names) - 1)
+            if isinstance(value, dict):
+                return dict((k, substitute(v)) for k, v in value.items())
+            if isinstance(value, (list, tuple)):
+                return [substitute(v) for v in value]
+            return value
+
+        serialized = json.dumps(substitute(template))
+        # Splitting on the markers leaves the constant JSON fragments at even
+        # positions and parameter indexes at odd positions
+        pieces = re.split('"%s:(\\d+)"' % token, serialized)
+        self._segments = pieces[0::2]
+        self._names = [names[int(i)] for i in pieces[1::2]]
+        self.params = frozenset(names)
+        if isinstance(self.limit, Param):
+            self.params |= {self.limit.name}
+
+
+    def __repr__(self):
+        return '<%s %s>' % (type(self).__name__, ''.join(
+            seg if i == 0 else ':%s%s' % (name, seg)
+            for i, (name, seg) in enumerate(zip([None] + self._names, self._segments))
+        ))
+
+
+    def __call__(self, **values):
+        return self.bind(**values)
+
+
+    def bind(self, **values) -> 'BoundQuery':
+        """Bind values to all parameters of the query.
+
+        :raise TypeError: if a parameter is missing a value, or a value does not
+                          belong to any parameter
+        """
+        if values.keys() != self.params:
+            missing = self.params.difference(values)
+            if missing:
+                raise TypeError('missing values for parameters: %s' % ', '.join(sorted(missing)))
+            raise TypeError('unknown parameters: %s' % ', '.join(sorted(set(values) - self.params)))
+        return BoundQuery(self, values)
+
+
+class BoundQuery:
+    """A `PreparedQuery` with values bound to its parameters.
+
+    Supports read-only item access to the top-level members of the query, with
+    the parameters substituted.
+    """
+
+    def __init__(self, prepared: PreparedQuery, values: dict):
+        self.prepared = prepared
+        self.values = values
+        self._dict = None
+
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, self.values)
+
+
+    def __getitem__(self, key):
+        return self.to_dict()[key]
+
+
+    def get(self, key, default=None):
+        return self.to_dict().get(key, default)
+
+
+    @property
+    def limit(self) -> int:
+        limit = self.prepared.limit
+        return self.values[limit.name] if isinstance(limit, Param) else limit
+
+
+    def to_dict(self) -> dict:
+        """Return the query as a plain `dict`, with the parameters substituted"""
+        if self._dict is None:
+            self._dict = json.loads(self.encode())
+        return self._dict
+
+
+    def encode(self, bookmark: str = None, limit: int = None) -> bytes:
+        """Serialize the query to JSON, optionally with a bookmark and a
+        ``limit`` overriding the one of the template.
+        """
+        segments = self.prepared._segments
+        values = self.values
+        parts = [segments[0]]
+        for name, segment in zip(self.prepared._names, segments[1:]):
+            parts.append(_encode_value(values[name]))
+            parts.append(segment)
+        head = []
+        if limit is None:
+            limit = self.limit
+        if limit is not None:
+            head.append('"limit": %s' % _encode_value(limit))
+        if bookmark is not None:
+            head.append('"bookmark": %s' % _encode_value(bookmark))
+        if head:
+            # The template always serializes to an object with a selector
+            parts[0] = '{%s, %s' % (', '.join(head), parts[0][1:])
+        return ''.join(parts).encode('utf-8')
@@ -10,6 +10,13 @@ class FindQuery(dict):
         super().__init__(self, selector=selector, **options)
     
 
+    def matches(self, doc) -> bool:
+        """Evaluate the selector against a document locally, without a request
+        to the server. See `couchdb.client.find.selector`.
+        """
+        return compile_selector(self['selector'])(doc)
+    
+
     @property
     def selector(self):
         """JSON object describing criteria used to select documents. Required"""
@@ -189,4 +196,4 @@ class FindQuery(dict):
             self['execution_stats'] = value
 
 
-
+from .selector import compile_selector
@@ -9,7 +9,10 @@ class FindResponse:
         self.warning = response.get('warning')
         self.execution_stats = response.get('execution_stats')
         self.wrapper = wrapper
-        self.has_next_page = self.bookmark is not None and self.count == page_size
+        self.page_size = page_size
+        # A short page means there is nothing left to fetch
+        self.has_next_page = self.bookmark is not None and self.count >= page_size
+        self.elapsed = self.size = None
     
 
     @property
@@ -0,0 +1,216 @@
+"""Local evaluation of Mango selectors.
+
+`compile_selector` turns a Mango selector into a predicate function that
+tells whether a document matches, following the semantics of CouchDB's
+``_find``: values are compared with CouchDB collation (see
+`couchdb.client.collation`), arrays are only searched implicitly by
+``$in`` and ``$nin``, which look at their elements (use ``$elemMatch`` or
+``$all`` otherwise), and a missing field only matches ``{"$exists": false}``
+(or the negation of another condition).
+
+>>> matches = compile_selector({'type': 'Person', 'age': {'$gte': 18}})
+>>> matches({'type': 'Person', 'age': 42}), matches({'type': 'Person'})
+(True, False)
+"""
+
+from functools import lru_cache
+import json
+import re
+
+from ..collation import collation_key
+
+
+class SelectorError(ValueError):
+    """Raised for selectors that cannot be compiled"""
+
+
+class _Missing(object):
+    def __repr__(self):
+        return '<missing>'
+
+MISSING = _Missing()
+
+
+def compile_selector(selector):
+    """Compile a Mango selector into a predicate taking a document.
+
+    Compiled predicates are cached, so compiling the same selector again is
+    cheap.
+
+    :param selector: the selector, as it would be sent in a ``_find`` query
+    :return: a function returning `True` for the documents the selector matches
+    :raise SelectorError: if the selector uses an unknown operator or invalid
+                          operator arguments
+    """
+    return _compile_cached(json.dumps(selector))
+
+
+@lru_cache(maxsize=1024)
+def _compile_cached(selector):
+    return _compile(json.loads(selector))
+
+
+def _split_path(field):
+    """Split a field name on the dots that are not escaped with a backslash"""
+    parts = re.split(r'(?<!\\)\.', field)
+    return tuple(part.replace('\\.', '.') for part in parts)
+
+
+def _get_field(value, path):
+    for part in path:
+        if isinstance(value, dict):
+            value = value.get(part, MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return MISSING
+        if value is MISSING:
+            break
+    return value
+
+
+def _compile(selector):
+    """Compile a selector to a predicate on a value (a document, or the value
+    of a field for selectors nested under a field name)
+    """
+    if not isinstance(selector, dict):
+        raise SelectorError('selector must be an object, got %r' % (selector,))
+    predicates = []
+    for key, arg in selector.items():
+        if key.startswith('$'):
+            predicates.append(_compile_operator(key, arg))
+        else:
+            predicates.append(_compile_field(_split_path(key), arg))
+    if len(predicates) == 1:
+        return predicates[0]
+    return lambda value: all(p(value) for p in predicates)
+
+
+def _compile_field(path, arg):
+    if isinstance(arg, dict):
+        condition = _compile(arg)
+    else:
+        condition = _compile_operator('$eq', arg)
+    return lambda value: condition(_get_field(value, path))
+
+
+def _selectors(op, arg):
+    if not isinstance(arg, list) or not arg:
+        raise SelectorError('%s expects a non-empty array' % op)
+    return [_compile(s) for s in arg]
+
+
+def _type_name(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, list):
+        return 'array'
+    return 'object'
+
+
+def _rem(value, divisor):
+    """Integer remainder with the sign of the dividend, as in Erlang, computed
+    exactly for integers of any size
+    """
+    remainder = abs(value) % abs(divisor)
+    return -remainder if value < 0 else remainder
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _compile_operator(op, arg):
+    # Combination operators take selectors applied to the same value
+    if op == '$and':
+        subs = _selectors(op, arg)
+        return lambda value: all(s(value) for s in subs)
+    if op == '$or':
+        subs = _selectors(op, arg)
+        return lambda value: any(s(value) for s in subs)
+    if op == '$nor':
+        subs = _selectors(op, arg)
+        return lambda value: not any(s(value) for s in subs)
+    if op == '$not':
+        sub = _compile(arg)
+        return lambda value: not sub(value)
+
+    if op == '$exists':
+        if not isinstance(arg, bool):
+            raise SelectorError('$exists expects a boolean')
+        return lambda value: (value is not MISSING) == arg
+
+    test = _compile_condition(op, arg)
+    return lambda value: value is not MISSING and test(value)
+
+
+def _compile_condition(op, arg):
+    """Compile an operator that only applies to values that exist"""
+    if op in ('$eq', '$ne', '$gt', '$gte', '$lt', '$lte'):
+        key = collation_key(arg)
+        return {
+            '$eq': lambda value: collation_key(value) == key,
+            '$ne': lambda value: collation_key(value) != key,
+            '$gt': lambda value: collation_key(value) > key,
+            '$gte': lambda value: collation_key(value) >= key,
+            '$lt': lambda value: collation_key(value) < key,
+            '$lte': lambda value: collation_key(value) <= key,
+        }[op]
+    if op in ('$in', '$nin', '$all'):
+        if not isinstance(arg, list):
+            raise SelectorError('%s expects an array' % op)
+        keys = [collation_key(item) for item in arg]
+        def match_in(value):
+            # like CouchDB, an array matches if any of its elements does
+            if isinstance(value, list):
+                return any(collation_key(item) in keys for item in value)
+            return collation_key(value) in keys
+        if op == '$in':
+            return match_in
+        if op == '$nin':
+            return lambda value: not match_in(value)
+        def match_all(value):
+            # like CouchDB, an empty $all matches nothing
+            if not keys or not isinstance(value, list):
+                return False
+            items = [collation_key(item) for item in value]
+            return all(key in items for key in keys)
+        return match_all
+    if op == '$type':
+        types = ('null', 'boolean', 'number', 'string', 'array', 'object')
+        if arg not in types:
+            raise SelectorError('$type expects one of %s' % ', '.join(types))
+        return lambda value: _type_name(value) == arg
+    if op == '$size':
+        if not _is_int(arg):
+            raise SelectorError('$size expects an integer')
+        return lambda value: isinstance(value, list) and len(value) == arg
+    if op == '$mod':
+        if not (isinstance(arg, list) and len(arg) == 2 and all(_is_int(a) for a in arg) and arg[0] != 0):
+            raise SelectorError('$mod expects [divisor, remainder] with a non-zero divisor')
+        divisor, remainder = arg
+        return lambda value: _is_int(value) and _rem(value, divisor) == remainder
+    if op == '$regex':
+        if not isinstance(arg, str):
+            raise SelectorError('$regex expects a string')
+        try:
+            pattern = re.compile(arg)
+        except re.error as e:
+            raise SelectorError('invalid $regex %r: %s' % (arg, e))
+        return lambda value: isinstance(value, str) and pattern.search(value) is not None
+    if op == '$elemMatch':
+        sub = _compile(arg)
+        return lambda value: isinstance(value, list) and any(sub(item) for item in value)
+    if op == '$allMatch':
+        sub = _compile(arg)
+        return lambda value: isinstance(value, list) and bool(value) and all(sub(item) for item in value)
+    if op == '$keyMapMatch':
+        sub = _compile(arg)
+        return lambda value: isinstance(value, dict) and any(sub(key) for key in value)
+    raise SelectorError('unknown operator %s' % op)
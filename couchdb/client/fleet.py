@@ -0,0 +1,218 @@
+"""Managing many server-side replications through the ``_replicator``
+database and the scheduler API.
+"""
+
+from .__common__ import *
+from .exceptions import CouchDBException
+
+
+# Members the replicator adds to replication documents
+_STATE_FIELDS = ('_rev', '_replication_id', '_replication_state', '_replication_state_time',
+                 '_replication_state_reason', '_replication_stats', 'owner')
+
+# Replication options tuned by `ReplicationFleet.rebalance`
+DEFAULT_BOOST = {'worker_processes': 8, 'http_connections': 40}
+
+
+def _spec(doc) -> dict:
+    """The declared part of a replication document"""
+    return dict((k, v) for k, v in doc.items() if k not in _STATE_FIELDS)
+
+
+class ReplicationFleet(object):
+    """Declare and monitor many replications at once.
+
+    Replications are declared as documents of the ``_replicator`` database,
+    which the server's replication scheduler runs, retries and restarts on
+    its own. `declare` brings the documents in line with a set of job
+    specifications in a few bulk requests, `status` combines the scheduler's
+    view of the documents and jobs into per-replication metrics, and
+    `rebalance` gives lagging replications more workers and connections.
+
+    >>> fleet = server.replication_fleet()                              # doctest: +SKIP
+    >>> fleet.declare({'users-backup': {'source': src_url,              # doctest: +SKIP
+    ...                                 'target': dst_url,
+    ...                                 'continuous': True}}, prune=True)
+    {'created': ['users-backup'], 'updated': [], 'deleted': [], 'unchanged': 0}
+
+    :param server: the `Server`
+    :param db: the name of the replicator database
+    """
+
+    def __init__(self, server, db='_replicator'):
+        self.server = server
+        self.db_name = db
+        self._samples = {}
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, self.db_name)
+
+    @property
+    def db(self):
+        return self.server[self.db_name]
+
+    def documents(self) -> dict:
+        """Return the replication documents, by ID."""
+        response = self.server.session.get(urljoin(self.server.url, self.db_name, '_all_docs'),
+                                           params={'include_docs': 'true'})
+        if not response.ok: raise CouchDBException.auto(response)
+        return dict((row['id'], row['doc']) for row in response.json()['rows']
+                    if not row['id'].startswith('_design/'))
+
+    def declare(self, jobs, prune=False, batch_size=500) -> dict:
+        """Create or update the replication documents to match `jobs`.
+
+        Documents whose specification is unchanged are left alone, so the
+        running replications are not restarted; changed ones are updated,
+        which restarts them.
+
+        :param jobs: a mapping of document IDs to replication specifications
+                     (the members of a ``_replicator`` document, e.g.
+                     ``source``, ``target``, ``continuous``)
+        :param prune: delete the replication documents not in `jobs`
+        :param batch_size: the number of documents per bulk request
+        :return: a dict with the IDs of the ``created``, ``updated`` and
+                 ``deleted`` documents, and the number ``unchanged``
+        :raise CouchDBException: if writing any document failed; the other
+                                 documents are written nonetheless
+        """
+        existing = self.documents()
+        result = {'created': [], 'updated': [], 'deleted': [], 'unchanged': 0}
+        writes = []
+        for id, spec in jobs.items():
+            doc = dict(_spec(spec), _id=id)
+            current = existing.get(id)
+            if current is None:
+                result['created'].append(id)
+            elif _spec(current) != doc:
+                doc['_rev'] = current['_rev']
+                result['updated'].append(id)
+            else:
+                result['unchanged'] += 1
+                continue
+            writes.append(doc)
+        if prune:
+            for id, current in existing.items():
+                if id not in jobs:
+                    writes.append({'_id': id, '_rev': current['_rev'], '_deleted': True})
+                    result['deleted'].append(id)
+        self._write(writes, batch_size)
+        return result
+
+    def _write(self, docs, batch_size):
+        if not docs:
+            return
+        db = self.db
+        errors = []
+        for i in range(0, len(docs), batch_size):
+            for outcome in db.bulk_update(docs[i:i + batch_size]):
+                if 'error' in outcome:
+                    errors.append('%s: %s' % (outcome['id'], outcome['error']))
+        if errors:
+            raise CouchDBException('bulk_write', 'failed to write replication documents: '
+                                   + ', '.join(errors))
+
+    def _scheduler(self, kind, key, page_size=1000):
+        url = urljoin(self.server.url, '_scheduler', kind)
+        if kind == 'docs':
+            url = urljoin(url, self.db_name)
+        skip = 0
+        while True:
+            response = self.server.session.get(url, params={'limit': page_size, 'skip': skip})
+            if not response.ok: raise CouchDBException.auto(response)
+            items = response.json()[key]
+            for item in items:
+                yield item
+            if len(items) < page_size:
+                return
+            skip += len(items)
+
+    def status(self) -> dict:
+        """Return the state and metrics of every replication, by document ID.
+
+        Each value is a dict with
+
+        * ``state``: the scheduler state, e.g. ``running``, ``pending``,
+          ``crashing``, ``failed`` or ``completed``
+        * ``docs_written`` and ``doc_write_failures``: the job's counters
+        * ``lag``: the number of source changes not processed yet, if known
+        * ``throughput``: the documents written per second since the previous
+          call of `status`, if there was one
+        * ``error_count`` and ``error``: the consecutive failures and the last
+          error of a crashing or failed replication
+        * ``backoff``: whether the scheduler is delaying restarts of the job
+          after failures
+        * ``crashes``: the number of crashes in the job's recent history
+        """
+        now = time.monotonic()
+        crashes = {}
+        for job in self._scheduler('jobs', 'jobs'):
+            if job.get('database') == self.db_name and job.get('doc_id'):
+                crashes[job['doc_id']] = sum(1 for event in job.get('history', ())
+                                             if event.get('type') == 'crashed')
+        status = {}
+        samples = {}
+        for doc in self._scheduler('docs', 'docs'):
+            id = doc['doc_id']
+            info = doc.get('info') or {}
+            written = info.get('docs_written')
+            throughput = None
+            previous = self._samples.get(id)
+            if written is not None:
+                samples[id] = (now, written)
+                if previous is not None and now > previous[0] and written >= previous[1]:
+                    throughput = (written - previous[1]) / (now - previous[0])
+            error_count = doc.get('error_count', 0)
+            status[id] = {
+                'state': doc.get('state'),
+                'docs_written': written,
+                'doc_write_failures': info.get('doc_write_failures'),
+                'lag': info.get('changes_pending'),
+                'throughput': throughput,
+                'error_count': error_count,
+                'error': info.get('error'),
+                'backoff': error_count > 0 and doc.get('state') in ('crashing', 'pending'),
+                'crashes': crashes.get(id, 0),
+            }
+        self._samples = samples
+        return status
+
+    def rebalance(self, lag_threshold=10000, boost=None, max_changes=50) -> list:
+        """Move replication resources to the replications that fall behind.
+
+        CouchDB does not have job priorities, so a lagging replication is
+        prioritized by giving it more worker processes and connections (the
+        `boost` options) in its document; when it has caught up, the options
+        are removed again so it falls back to the server defaults. Every
+        change restarts the replication, so at most `max_changes` documents
+        are updated per call. Declaring the jobs again with `declare` resets
+        the options to the declared ones.
+
+        :param lag_threshold: the number of pending changes above which a
+                              running replication is boosted
+        :param boost: the replication options of boosted replications, by
+                      default `DEFAULT_BOOST`
+        :param max_changes: the maximum number of documents to update
+        :return: the IDs of the updated documents
+        """
+        boost = boost or DEFAULT_BOOST
+        documents = self.documents()
+        status = self.status()
+        # the replications falling furthest behind go first
+        order = sorted(status.items(), key=lambda item: -(item[1]['lag'] or 0))
+        writes = []
+        for id, job in order:
+            doc = documents.get(id)
+            if doc is None or job['state'] != 'running' or job['lag'] is None:
+                continue
+            boosted = all(doc.get(k) == v for k, v in boost.items())
+            if job['lag'] >= lag_threshold and not boosted:
+                writes.append(dict(doc, **boost))
+            elif job['lag'] < lag_threshold / 10 and any(k in doc for k in boost):
+                writes.append(dict((k, v) for k, v in doc.items() if k not in boost))
+            else:
+                continue
+            if len(writes) >= max_changes:
+                break
+        self._write([dict(_spec(doc), _rev=doc['_rev']) for doc in writes], max_changes)
+        return [doc['_id'] for doc in writes]
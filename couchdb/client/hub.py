@@ -0,0 +1,239 @@
+"""A shared changes feed fanned out to in-process subscribers."""
+
+from .__common__ import *
+from .changes import ChangesFeed
+from .exceptions import CouchDBException
+from .find.selector import compile_selector
+from collections import deque
+import threading
+
+
+class Subscription(object):
+    """A subscriber's view of a `ChangesHub`: a bounded queue of the changes
+    that pass its filters.
+
+    Iterate over the subscription (or call `get`) to receive the changes;
+    iteration ends when the subscription or the hub is closed. If the hub
+    dropped the subscriber for falling behind, or the upstream feed failed,
+    the error is raised instead.
+    """
+
+    def __init__(self, hub, predicate, maxsize, overflow, timeout):
+        if overflow not in ('block', 'drop'):
+            raise ValueError('overflow must be "block" or "drop", not %r' % overflow)
+        self.hub = hub
+        self.predicate = predicate
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.timeout = timeout
+        self.error = None
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __repr__(self):
+        return '<%s pending=%d%s>' % (type(self).__name__, len(self._items),
+                                      ' closed' if self._closed else '')
+
+    def __iter__(self):
+        while True:
+            change = self.get()
+            if change is None:
+                return
+            yield change
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def get(self, timeout=None):
+        """Return the next change, waiting up to `timeout` seconds (forever
+        if `None`).
+
+        :return: the change, or `None` if the subscription is closed or no
+                 change arrived in time
+        :raise CouchDBException: if the subscriber was dropped or the
+                                 upstream feed failed
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if self._items:
+                change = self._items.popleft()
+                self._cond.notify_all()
+                return change
+            if self.error is not None:
+                raise self.error
+            return None
+
+    def close(self):
+        """Unsubscribe. Changes not received yet are discarded."""
+        self.hub._unsubscribe(self)
+        self._close()
+        with self._cond:
+            self._items.clear()
+
+    def _close(self, error=None):
+        with self._cond:
+            if not self._closed:
+                self._closed = True
+                self.error = error
+            self._cond.notify_all()
+
+    def _put(self, change) -> bool:
+        """Queue `change`, blocking while the queue is full if the overflow
+        policy allows it. Return `False` if the change could not be queued.
+        """
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.overflow == 'drop':
+                    return False
+                if not self._cond.wait_for(
+                        lambda: len(self._items) < self.maxsize or self._closed, self.timeout):
+                    return False
+            if not self._closed:
+                self._items.append(change)
+                self._cond.notify_all()
+            return True
+
+
+class ChangesHub(object):
+    """Share one ``_changes`` connection among many consumers in a process.
+
+    The hub reads a continuous feed on a background thread, started with the
+    first subscription, and passes every change to the subscriptions whose
+    filters it passes. Subscribers only receive the changes that arrive after
+    they subscribed.
+
+    Each subscription has its own bounded queue. When a queue is full, the
+    hub either waits for the subscriber to catch up (``overflow='block'``,
+    which holds back every other subscriber too, for at most `timeout`
+    seconds) or drops the subscriber at once (``overflow='drop'``). A dropped
+    subscriber gets an error once it has drained its queue, and needs to
+    resubscribe and catch up on its own, e.g. with `Database.changes_feed`.
+
+    >>> hub = db.changes_hub()                                   # doctest: +SKIP
+    >>> people = hub.subscribe(selector={'type': 'Person'})      # doctest: +SKIP
+    >>> for change in people:                                    # doctest: +SKIP
+    ...     greet(change['doc'])                                 # doctest: +SKIP
+
+    :param db: the `Database`
+    :param since: the sequence to start the upstream feed from
+    :param include_docs: include the documents in the changes, which
+                         subscriptions filtering with a selector need
+    :param options: further `ChangesFeed` arguments
+    """
+
+    def __init__(self, db, since='now', include_docs=True, **options):
+        self.db = db
+        self.since = since
+        self.include_docs = include_docs
+        self.options = options
+        self.error = None
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self._feed = None
+        self._thread = None
+
+    def __repr__(self):
+        return '<%s %r subscribers=%d>' % (type(self).__name__, self.db.name,
+                                           len(self._subscriptions))
+
+    @property
+    def last_seq(self):
+        """The sequence of the last change read from the upstream feed"""
+        return self._feed.last_seq if self._feed is not None else self.since
+
+    def subscribe(self, id_prefix=None, selector=None, filter=None, maxsize=1000,
+                  overflow='block', timeout=10.0) -> Subscription:
+        """Subscribe to the changes of the database.
+
+        :param id_prefix: only receive changes to documents whose ID starts
+                          with this prefix
+        :param selector: only receive changes whose document matches this
+                         Mango selector, evaluated locally
+        :param filter: only receive changes for which this callable returns
+                       true
+        :param maxsize: the number of changes the subscription holds before
+                        the overflow policy applies
+        :param overflow: ``'block'`` to hold back the feed while the queue is
+                         full, dropping the subscriber after `timeout`
+                         seconds, or ``'drop'`` to drop it right away
+        :param timeout: the longest time to wait for a ``'block'`` subscriber
+                        to make room, `None` to wait indefinitely
+        """
+        predicates = []
+        if id_prefix is not None:
+            predicates.append(lambda change: change['id'].startswith(id_prefix))
+        if selector is not None:
+            if not self.include_docs:
+                raise ValueError('selector subscriptions need a hub with include_docs')
+            matches = compile_selector(selector)
+            predicates.append(lambda change: 'doc' in change and matches(change['doc']))
+        if filter is not None:
+            predicates.append(filter)
+        subscription = Subscription(self, lambda change: all(p(change) for p in predicates),
+                                    maxsize, overflow, timeout)
+        with self._lock:
+            if self.error is not None:
+                raise self.error
+            self._subscriptions.append(subscription)
+            if self._thread is None:
+                self._start()
+        return subscription
+
+    def close(self):
+        """Stop the upstream feed and close all subscriptions."""
+        with self._lock:
+            feed, self._feed = self._feed, None
+            subscriptions, self._subscriptions = self._subscriptions, []
+            self._thread = None
+        if feed is not None:
+            feed.close()
+        for subscription in subscriptions:
+            subscription._close()
+
+    def _start(self):
+        db = type(self.db)(self.db.url, self.db._name, clone_session(self.db.session))
+        self._feed = ChangesFeed(db, 'continuous', self.since,
+                                 include_docs=self.include_docs, **self.options)
+        self._thread = threading.Thread(target=self._run, args=(self._feed,), daemon=True)
+        self._thread.start()
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def _run(self, feed):
+        try:
+            for change in feed:
+                for subscription in list(self._subscriptions):
+                    try:
+                        if subscription.closed or not subscription.predicate(change):
+                            continue
+                        error = None
+                        if not subscription._put(change):
+                            error = CouchDBException('subscriber_dropped',
+                                                     'the subscriber fell %d changes behind'
+                                                     % subscription.maxsize)
+                    except Exception as e:
+                        # a failing filter only affects its own subscriber
+                        error = e
+                    if error is not None:
+                        self._unsubscribe(subscription)
+                        subscription._close(error)
+        except Exception as e:
+            with self._lock:
+                if feed is not self._feed:
+                    return # closed
+                self.error = e
+                subscriptions, self._subscriptions = self._subscriptions, []
+            for subscription in subscriptions:
+                subscription._close(e)
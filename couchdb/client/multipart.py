@@ -0,0 +1,165 @@
+"""Reading and writing MIME multipart bodies, as CouchDB uses them for
+documents with attachments.
+"""
+
+from .exceptions import CouchDBException
+import uuid
+
+
+def parse_content_type(value):
+    """Split a ``Content-Type`` header into the lowercased media type and a
+    dict of its parameters.
+
+    >>> parse_content_type('multipart/related; boundary="abc"')
+    ('multipart/related', {'boundary': 'abc'})
+    """
+    mimetype, _, rest = (value or '').partition(';')
+    params = {}
+    for param in rest.split(';'):
+        name, sep, val = param.strip().partition('=')
+        if sep:
+            params[name.strip().lower()] = val.strip().strip('"')
+    return mimetype.strip().lower(), params
+
+
+def _parse_headers(data):
+    headers = {}
+    for line in data.decode('latin-1').split('\r\n'):
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def iter_parts(chunks, boundary):
+    """Split a multipart body, given as an iterable of byte chunks, into its
+    parts as they arrive.
+
+    Only the part being read is held in memory, so a response with many
+    parts can be processed without buffering it completely.
+
+    :param chunks: the body, e.g. ``response.iter_content(8192)``
+    :param boundary: the ``boundary`` parameter of the ``Content-Type``
+    :return: an iterator over ``(headers, body)`` pairs, with the header
+             names lowercased
+    :raise CouchDBException: if the body ends before the closing boundary
+    """
+    separator = b'\r\n--' + boundary.encode('latin-1')
+    chunks = iter(chunks)
+    # the first boundary is not preceded by a line break
+    buffer = bytearray(b'\r\n')
+
+    def fill():
+        for chunk in chunks:
+            if chunk:
+                buffer.extend(chunk)
+                return True
+        raise CouchDBException('multipart', 'multipart body ends before its closing boundary')
+
+    def find_separator():
+        start = 0
+        while True:
+            index = buffer.find(separator, start)
+            if index >= 0:
+                return index
+            start = max(0, len(buffer) - len(separator) + 1)
+            fill()
+
+    index = find_separator()
+    del buffer[:index + len(separator)]
+    while True:
+        while len(buffer) < 2:
+            fill()
+        if buffer[:2] == b'--':
+            return
+        # skip the rest of the boundary line
+        while b'\r\n' not in buffer:
+            fill()
+        del buffer[:buffer.index(b'\r\n') + 2]
+        index = find_separator()
+        part = bytes(buffer[:index])
+        del buffer[:index + len(separator)]
+        if part.startswith(b'\r\n'):
+            headers, body = {}, part[2:]
+        else:
+            head, _, body = part.partition(b'\r\n\r\n')
+            headers = _parse_headers(head)
+        yield headers, body
+
+
+class MultipartWriter(object):
+    """A streamed ``multipart/related`` request body made of byte strings and
+    `UploadStream` parts.
+
+    Like `UploadStream`, it is read block by block by `requests`, and its
+    `len` is the number of bytes left, so the whole body is sent with a
+    ``Content-Length`` without being assembled in memory.
+
+    :param parts: a list of ``(headers, content)`` pairs, `content` being
+                  ``bytes`` or an `UploadStream` of known length
+    :param progress: a callable receiving the number of bytes sent so far and
+                     the total, after every block
+    """
+
+    def __init__(self, parts, progress=None):
+        self.boundary = uuid.uuid4().hex
+        delimiter = b'--' + self.boundary.encode('ascii')
+        self._segments = []
+        for headers, content in parts:
+            head = b''.join(b'%s: %s\r\n' % (name.encode('latin-1'), value.encode('latin-1'))
+                            for name, value in headers.items())
+            self._segments.append(delimiter + b'\r\n' + head + b'\r\n')
+            self._segments.append(content)
+            self._segments.append(b'\r\n')
+        self._segments.append(delimiter + b'--')
+        self.length = sum(len(segment) for segment in self._segments)
+        self.progress = progress
+        self.sent = 0
+        self._index = 0
+        self._offset = 0
+
+    def __repr__(self):
+        return '<%s %d/%d>' % (type(self).__name__, self.sent, self.length)
+
+    @property
+    def content_type(self) -> str:
+        return 'multipart/related; boundary="%s"' % self.boundary
+
+    def __len__(self):
+        return self.length - self.sent
+
+    def __bool__(self):
+        return True
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self)
+        while self._index < len(self._segments):
+            segment = self._segments[self._index]
+            if isinstance(segment, bytes):
+                chunk = memoryview(segment)[self._offset:self._offset + size]
+                self._offset += len(chunk)
+                if self._offset >= len(segment):
+                    self._index += 1
+                    self._offset = 0
+            else:
+                chunk = segment.read(size)
+                if not chunk:
+                    if len(segment):
+                        raise CouchDBException('multipart', 'attachment ended %d bytes short'
+                                               % len(segment))
+                    self._index += 1
+                    continue
+            if chunk:
+                self.sent += len(chunk)
+                if self.progress is not None:
+                    self.progress(self.sent, self.length)
+                return chunk
+        return b''
@@ -0,0 +1,84 @@
+"""Background prefetching for paged iteration."""
+
+import queue
+import threading
+
+
+_DONE = object()
+
+
+class Prefetcher(object):
+    """Iterate over `iterable` on a background thread, keeping up to `depth`
+    items fetched ahead of the consumer.
+
+    This is meant for iterables whose items are pages of results that each
+    cost a request: the next page is requested while the current one is still
+    being processed. At most `depth` items are held that the consumer has not
+    taken yet. An exception raised by the iterable is re-raised by `__next__`
+    at the point where the consumer would have received the failed item.
+
+    Call `close()` (or use the prefetcher as a context manager) to stop the
+    background thread when the iteration is abandoned early.
+    """
+
+    def __init__(self, iterable, depth=1):
+        if depth <= 0:
+            raise ValueError('depth must be 1 or more')
+        self.depth = depth
+        self._items = queue.Queue()
+        self._slots = threading.Semaphore(depth)
+        self._stop = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, args=(iter(iterable),),
+                                        daemon=True)
+        self._thread.start()
+
+    def __repr__(self):
+        return '<%s depth=%d>' % (type(self).__name__, self.depth)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration()
+        item, error = self._items.get()
+        if item is _DONE:
+            self._closed = True
+            if error is not None:
+                raise error
+            raise StopIteration()
+        self._slots.release()
+        return item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop fetching ahead. Items already fetched are discarded."""
+        self._closed = True
+        self._stop.set()
+        self._slots.release()
+
+    def _run(self, iterator):
+        try:
+            while True:
+                self._slots.acquire()
+                if self._stop.is_set():
+                    break
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                self._items.put((item, None))
+        except BaseException as e:
+            self._items.put((_DONE, e))
+            return
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+        self._items.put((_DONE, None))
@@ -0,0 +1,163 @@
+"""Parallel processing of changes feeds with ordered checkpoints."""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from .checkpoint import as_checkpointer
+
+
+class _Entry(object):
+    __slots__ = ('change', 'done')
+
+    def __init__(self, change):
+        self.change = change
+        self.done = False
+
+
+class ChangesProcessor(object):
+    """Dispatch the changes of a feed to a pool of handlers.
+
+    Changes to different documents are handled in parallel, while the changes
+    to any single document are handled one after the other, in feed order.
+    The checkpoint only moves past a sequence once that change and every change
+    before it has been handled, so restarting from the last checkpoint never
+    skips a change (though some may be handled twice).
+
+    >>> def handle(change):
+    ...     index(change['doc'])
+    >>> feed = db.changes_feed(include_docs=True)               # doctest: +SKIP
+    >>> ChangesProcessor(feed, handle, workers=8).run()          # doctest: +SKIP
+
+    :param feed: an iterable of changes, typically a `ChangesFeed`
+    :param handler: a callable taking one change; with a process pool it must
+                    be picklable
+    :param workers: the number of worker threads, if no `executor` is given
+    :param executor: a `concurrent.futures.Executor` to run the handlers in,
+                     e.g. a ``ProcessPoolExecutor``; it is not shut down by
+                     the processor
+    :param checkpoint: a callable that is passed the sequence up to which all
+                       changes have been handled, whenever it advances, or a
+                       `CheckpointStore`; a `Checkpointer` is flushed when
+                       `run` returns
+    :param max_pending: the maximum number of changes read from the feed but
+                        not handled yet
+    """
+
+    def __init__(self, feed, handler, workers=4, executor=None, checkpoint=None,
+                 max_pending=1000):
+        self.feed = feed
+        self.handler = handler
+        self.workers = workers
+        self.executor = executor
+        self.checkpoint = as_checkpointer(checkpoint)
+        self.max_pending = max_pending
+        self.handled = 0
+        self.last_seq = None
+        self.error = None
+        self._lock = threading.Condition()
+        self._checkpoint_lock = threading.Lock()
+        self._position = self._checkpointed = 0
+        self._entries = deque()
+        self._queued = {}
+        self._stopped = False
+
+    def __repr__(self):
+        return '<%s handled=%d last_seq=%r>' % (type(self).__name__, self.handled,
+                                                self.last_seq)
+
+    def stop(self):
+        """Stop reading the feed; `run` returns once the pending changes are
+        handled.
+        """
+        with self._lock:
+            self._stopped = True
+            self._lock.notify_all()
+        close = getattr(self.feed, 'close', None)
+        if close is not None:
+            close()
+
+    def run(self):
+        """Process the feed until it ends or `stop` is called.
+
+        :return: the sequence of the last checkpoint
+        :raise: the first exception raised by a handler, once the changes
+                already dispatched have finished
+        """
+        executor = self.executor or ThreadPoolExecutor(self.workers)
+        try:
+            for change in self.feed:
+                with self._lock:
+                    while (len(self._entries) >= self.max_pending and not self._stopped
+                           and self.error is None):
+                        # a failed change is never popped, so stop waiting on errors
+                        self._lock.wait()
+                    if self._stopped or self.error is not None:
+                        break
+                    entry = _Entry(change)
+                    self._entries.append(entry)
+                    queued = self._queued.get(change['id'])
+                    if queued is not None:
+                        # an earlier change to this document is being handled
+                        queued.append(entry)
+                        continue
+                    self._queued[change['id']] = deque()
+                self._submit(executor, entry)
+            with self._lock:
+                while self._entries and self.error is None:
+                    self._lock.wait()
+                while self._queued and self.error is not None:
+                    self._lock.wait()
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True)
+            flush = getattr(self.checkpoint, 'flush', None)
+            if flush is not None:
+                flush()
+        if self.error is not None:
+            raise self.error
+        return self.last_seq
+
+    def _submit(self, executor, entry):
+        future = executor.submit(self.handler, entry.change)
+        future.add_done_callback(lambda f: self._done(executor, entry, f))
+
+    def _done(self, executor, entry, future):
+        error = future.exception()
+        next_entry = seq = None
+        with self._lock:
+            doc_id = entry.change['id']
+            queued = self._queued[doc_id]
+            if error is not None:
+                if self.error is None:
+                    self.error = error
+                # the remaining changes to this document are not handled
+                del self._queued[doc_id]
+                self._lock.notify_all()
+                return
+            entry.done = True
+            self.handled += 1
+            if queued and self.error is None:
+                next_entry = queued.popleft()
+            else:
+                del self._queued[doc_id]
+            entries = self._entries
+            while entries and entries[0].done:
+                seq = entries.popleft().change['seq']
+                self._position += 1
+            if seq is not None:
+                self.last_seq = seq
+            position = self._position
+            self._lock.notify_all()
+        if next_entry is not None:
+            self._submit(executor, next_entry)
+        if seq is not None and self.checkpoint is not None:
+            self._checkpoint(seq, position)
+
+    def _checkpoint(self, seq, position):
+        with self._checkpoint_lock:
+            if position <= self._checkpointed:
+                # a later completion has already moved the checkpoint further
+                return
+            self.checkpoint(seq)
+            self._checkpointed = position
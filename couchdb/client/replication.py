@@ -0,0 +1,227 @@
+"""Client-side replication between databases."""
+
+from .__common__ import *
+from .changes import ChangesFeed
+from .checkpoint import CheckpointStore, LocalDocumentCheckpointStore, Checkpointer
+from .processor import ChangesProcessor
+from hashlib import md5
+import threading
+
+
+def seq_number(seq) -> int:
+    """Return the numeric part of an update sequence, which is an integer in
+    CouchDB 1.x and a string starting with a number in later versions.
+    """
+    if seq is None:
+        return 0
+    if isinstance(seq, int):
+        return seq
+    return int(str(seq).split('-', 1)[0])
+
+
+class ReplicationCheckpointStore(CheckpointStore):
+    """Keep a replication checkpoint in ``_local`` documents in both the
+    source and the target database.
+
+    A checkpoint is only trusted if both copies agree: if either database
+    was recreated or restored, replication starts over from the beginning,
+    which is slower but never skips a change.
+    """
+
+    def __init__(self, source, target, id):
+        self.stores = (LocalDocumentCheckpointStore(source, id),
+                       LocalDocumentCheckpointStore(target, id))
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, self.stores[0].id)
+
+    def load(self):
+        source_seq, target_seq = [store.load() for store in self.stores]
+        return source_seq if source_seq == target_seq else None
+
+    def save(self, seq):
+        for store in self.stores:
+            store.save(seq)
+
+
+class Replicator(object):
+    """Replicate the documents of one database to another from the client,
+    following the CouchDB replication protocol, for databases that cannot
+    reach each other through the server's ``_replicate``.
+
+    The source's changes are read in batches of `batch_size`. For each batch,
+    the revisions missing from the target are found with ``_revs_diff``,
+    fetched with their history and attachments from the source with
+    ``_bulk_get``, and written to the target with ``_bulk_docs`` and
+    ``new_edits=false``, which adds them to the revision trees as they are.
+    Up to `workers` batches are replicated at the same time, each worker
+    with sessions of its own; the checkpoint, kept in ``_local`` documents on
+    both sides, only advances past batches that are completely written, so a
+    replication can be stopped at any time and resumed later.
+
+    >>> replicator = Replicator(source_db, target_db, workers=8)  # doctest: +SKIP
+    >>> replicator.run()                                          # doctest: +SKIP
+    {'docs_read': 1200, 'docs_written': 1187, ...}
+
+    :param source: the source `Database`
+    :param target: the target `Database`
+    :param workers: the number of batches replicated concurrently
+    :param batch_size: the number of changes per batch
+    :param continuous: keep replicating new changes until `stop` is called
+    :param since: the sequence to start from instead of the checkpoint
+    :param checkpoint_interval: the least number of seconds between two
+                                checkpoint writes
+    :param options: further ``_changes`` parameters, e.g. ``filter`` or
+                    ``doc_ids``; they are part of the replication ID
+    """
+
+    def __init__(self, source, target, workers=4, batch_size=500, continuous=False,
+                 since=None, checkpoint_interval=5.0, **options):
+        self.source = source
+        self.target = target
+        self.workers = workers
+        self.batch_size = batch_size
+        self.continuous = continuous
+        self.since = since
+        self.options = options
+        self.checkpointer = Checkpointer(
+            ReplicationCheckpointStore(source, target, self.replication_id),
+            every=workers, interval=checkpoint_interval)
+        self.docs_read = 0
+        self.missing_revisions = 0
+        self.docs_written = 0
+        self.doc_write_failures = 0
+        self.started = None
+        self._lock = threading.Lock()
+        self._feed = self._processor = None
+        self._local = threading.local()
+        self._sessions = []
+
+    def __repr__(self):
+        return '<%s %r -> %r>' % (type(self).__name__, self.source.url, self.target.url)
+
+    @property
+    def replication_id(self) -> str:
+        """The ID of the checkpoint documents, derived from the source and
+        target URLs and the changes options.
+        """
+        key = json.dumps([self.source.url, self.target.url, self.options],
+                         sort_keys=True, default=str)
+        return 'replication-' + md5(key.encode('utf-8')).hexdigest()
+
+    @property
+    def last_seq(self):
+        """The source sequence up to which everything has been replicated"""
+        return self.checkpointer.seq
+
+    def stats(self) -> dict:
+        """Return the counters of the replication so far, and its throughput
+        in documents written per second.
+        """
+        elapsed = time.monotonic() - self.started if self.started is not None else 0
+        with self._lock:
+            return {
+                'docs_read': self.docs_read,
+                'missing_revisions': self.missing_revisions,
+                'docs_written': self.docs_written,
+                'doc_write_failures': self.doc_write_failures,
+                'elapsed': elapsed,
+                'throughput': self.docs_written / elapsed if elapsed else 0.0,
+                'last_seq': self.last_seq,
+            }
+
+    def lag(self) -> int:
+        """Return the number of source updates not replicated yet, from the
+        source's current update sequence. This requests the database info.
+        """
+        update_seq = self.source.info()['update_seq']
+        return max(0, seq_number(update_seq) - seq_number(self.last_seq))
+
+    def run(self) -> dict:
+        """Replicate until the source's changes are exhausted or, for a
+        continuous replication, until `stop` is called.
+
+        :return: the `stats` of the replication
+        :raise: the first error replicating a batch, once the batches in
+                progress are done; the checkpoint stays before that batch
+        """
+        self.started = time.monotonic()
+        since = self.since if self.since is not None else self.checkpointer.load()
+        feed_options = dict(self.options, style='all_docs')
+        if self.continuous:
+            # heartbeats let partial batches go out while changes trickle in
+            feed_options['heartbeat'] = 1000
+        source = type(self.source)(self.source.url, self.source._name,
+                                   clone_session(self.source.session))
+        feed = ChangesFeed(source, 'continuous' if self.continuous else 'normal', since,
+                           **feed_options)
+        # Batches have distinct IDs so the processor handles them in parallel
+        batches = map(lambda i, batch: {'id': i, 'seq': batch[-1]['seq'], 'changes': batch},
+                      itertools.count(),
+                      feed.batches(self.batch_size, 1.0 if self.continuous else None))
+        self._feed = feed
+        self._processor = ChangesProcessor(batches, self._replicate, self.workers,
+                                           checkpoint=self.checkpointer,
+                                           max_pending=2 * self.workers)
+        self._local = threading.local()
+        try:
+            self._processor.run()
+        finally:
+            feed.close()
+            self._feed = self._processor = None
+            source.session.close()
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        return self.stats()
+
+    def stop(self):
+        """Stop a running replication once the batches in progress are
+        written.
+        """
+        feed, processor = self._feed, self._processor
+        if processor is not None:
+            processor.stop()
+        if feed is not None:
+            feed.close()
+
+    def _databases(self):
+        """The source and target databases of the current worker thread, with
+        sessions of their own.
+        """
+        databases = getattr(self._local, 'databases', None)
+        if databases is None:
+            databases = self._local.databases = tuple(
+                type(db)(db.url, db._name, clone_session(db.session))
+                for db in (self.source, self.target))
+            with self._lock:
+                self._sessions.extend(db.session for db in databases)
+        return databases
+
+    def _replicate(self, batch):
+        source, target = self._databases()
+        changes = batch['changes']
+        revs = {}
+        for change in changes:
+            revs.setdefault(change['id'], []).extend(c['rev'] for c in change['changes'])
+        missing = target.revs_diff(revs)
+        wanted = []
+        for id, diff in missing.items():
+            for rev in diff['missing']:
+                request = {'id': id, 'rev': rev}
+                if diff.get('possible_ancestors'):
+                    request['atts_since'] = diff['possible_ancestors']
+                wanted.append(request)
+        docs = []
+        if wanted:
+            for result in source.bulk_get(wanted, revs=True, attachments=True):
+                docs.extend(doc['ok'] for doc in result['docs'] if 'ok' in doc)
+        failures = 0
+        if docs:
+            # with new_edits=false only the failed writes are reported
+            failures = len(target.bulk_update(docs, new_edits=False))
+        with self._lock:
+            self.docs_read += len(changes)
+            self.missing_revisions += len(wanted)
+            self.docs_written += len(docs) - failures
+            self.doc_write_failures += failures + len(wanted) - len(docs)
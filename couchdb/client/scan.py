@@ -0,0 +1,183 @@
+"""Parallel scanning of views split into key ranges."""
+
+from .__common__ import *
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+
+
+def sample_split_points(db, name, partitions, **options):
+    """Pick split points that divide a view into `partitions` ranges holding
+    roughly the same number of rows.
+
+    The view is sampled with ``limit=1`` requests, each starting at the
+    previous split point and skipping the rows of one range, so this costs
+    ``partitions + 1`` (or ``+ 2`` with an ``endkey``) small requests and the
+    server steps over every row of the view at most once in total. Split
+    points are ``(key, docid)`` tuples so that long runs of identical keys can
+    still be split.
+
+    :param db: the `Database` holding the view
+    :param name: the name of the view, as accepted by `Database.view`
+    :param partitions: the number of ranges wanted
+    :param options: the query options restricting the scanned range
+                    (``startkey``, ``endkey``, ``descending``, ...)
+    :return: a list of at most ``partitions - 1`` split points, in view order
+    """
+    if partitions <= 0:
+        raise ValueError('partitions must be 1 or more')
+    options = dict(options)
+    if _is_design_view(name):
+        # sampling needs rows; _all_docs and other built-in views reject reduce
+        options['reduce'] = False
+    options.pop('limit', None)
+    options.pop('skip', None)
+    head = db.view(name, limit=0, **options)
+    first, total = head.offset, head.total_rows
+    if 'endkey' in options:
+        end = dict(options, startkey=options['endkey'])
+        end.pop('startkey_docid', None)
+        if 'endkey_docid' in options:
+            end['startkey_docid'] = end.pop('endkey_docid')
+        total = db.view(name, limit=0, **end).offset
+    count = total - first
+    points = []
+    start, offset = options, 0
+    for i in range(1, partitions):
+        target = count * i // partitions
+        rows = db.view(name, limit=1, skip=target - offset, **start).rows
+        if not rows:
+            break
+        point = (rows.keys[0], rows.ids[0])
+        if not points or points[-1] != point:
+            points.append(point)
+        # continue from this row, so no request skips more than one range
+        start = dict(options, startkey=point[0], startkey_docid=point[1])
+        start.pop('start_key', None)
+        start.pop('start_key_doc_id', None)
+        offset = target
+    return points
+
+
+def _is_design_view(name):
+    """Tell whether `name` (as accepted by `Database.view`) is a view of a
+    design document rather than a built-in view such as ``_all_docs``.
+    """
+    return not isinstance(name, str) or name.startswith('_design/')
+
+
+class ParallelViewScan(object):
+    """Scan the key ranges of a view concurrently.
+
+    The view is split at the given split points into consecutive ranges.
+    Every range is read with `Database.iterview` on its own connection, at
+    most `workers` ranges at a time. Rows are yielded as soon as they arrive
+    when `ordered` is false, or in view collation order otherwise; in that
+    case the ranges after the one currently being consumed are buffered, up
+    to `buffer` batches each.
+
+    Iterating over the scan starts the workers. Closing the iterator (or
+    dropping it) stops them after their current request.
+    """
+
+    def __init__(self, db, name, split_points, batch=1000, workers=4,
+                 ordered=False, wrapper=None, buffer=2, **options):
+        if workers <= 0:
+            raise ValueError('workers must be 1 or more')
+        if 'limit' in options:
+            raise ValueError('limit is not supported for parallel scans')
+        self.db = db
+        self.name = name
+        self.split_points = [p if isinstance(p, tuple) else (p, None)
+                             for p in split_points]
+        self.batch = batch
+        self.workers = workers
+        self.ordered = ordered
+        self.wrapper = wrapper
+        self.buffer = buffer
+        self.options = options
+
+    def __repr__(self):
+        return '<%s %r %d ranges>' % (type(self).__name__, self.name,
+                                      len(self.ranges()))
+
+    def ranges(self):
+        """Return the query options for each of the key ranges, in order."""
+        bounds = [None] + self.split_points + [None]
+        ranges = []
+        for start, end in zip(bounds, bounds[1:]):
+            options = self.options.copy()
+            if start is not None:
+                options['startkey'], docid = start
+                options.pop('startkey_docid', None)
+                if docid is not None:
+                    options['startkey_docid'] = docid
+                # the caller's skip only applies to the very first range
+                options.pop('skip', None)
+            if end is not None:
+                options['endkey'], docid = end
+                options.pop('endkey_docid', None)
+                if docid is not None:
+                    options['endkey_docid'] = docid
+                options['inclusive_end'] = False
+            ranges.append(options)
+        return ranges
+
+    def __iter__(self):
+        ranges = self.ranges()
+        maxsize = self.buffer if self.ordered else self.buffer * self.workers
+        queues = [queue.Queue(maxsize) for _ in ranges]
+        if not self.ordered:
+            queues = [queues[0]] * len(ranges)
+        stop = threading.Event()
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def scan(index, options):
+            q = queues[index]
+            session = clone_session(self.db.session)
+            try:
+                db = type(self.db)(self.db.url, self.db._name, session)
+                batches = db._iterview_batches(self.name, self.batch,
+                                               self.wrapper, options)
+                for rows, count in batches:
+                    if not put(q, (index, list(itertools.islice(rows, count)), None)):
+                        return
+                put(q, (index, None, None))
+            except BaseException as e:
+                put(q, (index, None, e))
+            finally:
+                session.close()
+
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = []
+        try:
+            for index, options in enumerate(ranges):
+                futures.append(executor.submit(scan, index, options))
+            pending = len(ranges)
+            current = 0
+            while pending:
+                index, rows, error = queues[current].get()
+                if error is not None:
+                    raise error
+                if rows is None:
+                    pending -= 1
+                    if self.ordered:
+                        current += 1
+                    continue
+                for row in rows:
+                    yield row
+        finally:
+            stop.set()
+            # the ranges not started yet are dropped, the running ones stop
+            # after their current request
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
@@ -1,5 +1,6 @@
 from .__common__ import *
 from .database import Database
+from .fleet import ReplicationFleet
 from .exceptions import *
 from typing import Generator, Iterable
 
@@ -210,6 +211,14 @@ class Server(object):
         if not response.ok: raise CouchDBException.auto(response)
         return response.json()
 
+    def replication_fleet(self, db='_replicator') -> ReplicationFleet:
+        """Manage the replications declared in a replicator database, in bulk.
+
+        :param db: the name of the replicator database
+        :return: a `ReplicationFleet`
+        """
+        return ReplicationFleet(self, db)
+
     def add_user(self, name, password, roles=None):
         """Add regular user in authentication database.
 
@@ -0,0 +1,52 @@
+"""Comparing databases by revision IDs only."""
+
+from .changes import ChangesFeed
+
+
+def missing_revisions(source, target, since=None, chunk_size=1000) -> dict:
+    """Find the revisions of `source` that `target` does not have.
+
+    The leaf revisions of every document are read from the source's
+    ``_changes?style=all_docs`` and checked against the target with
+    ``_revs_diff``, `chunk_size` documents at a time, so neither document
+    bodies nor the whole list of IDs are ever held or transferred.
+
+    :param source: the `Database` to read the revisions of
+    :param target: the `Database` to check them against
+    :param since: only check the documents changed in `source` after this
+                  sequence
+    :param chunk_size: the number of documents per request
+    :return: a mapping of document IDs to the lists of their revisions
+             missing from `target`
+    """
+    missing = {}
+    feed = ChangesFeed(source, 'normal', since, style='all_docs')
+    for changes in feed.batches(chunk_size):
+        revs = dict((change['id'], [c['rev'] for c in change['changes']]) for change in changes)
+        for id, diff in target.revs_diff(revs, chunk_size).items():
+            missing[id] = diff['missing']
+    return missing
+
+
+def diff_databases(a, b, since_a=None, since_b=None, chunk_size=1000) -> dict:
+    """Compute the difference between two databases from their changes
+    feeds, comparing revision IDs only.
+
+    >>> diff_databases(db, replica)                              # doctest: +SKIP
+    {'missing_in_b': {'doc1': ['2-7051cbe5c8faecd085a3fa619e6e6337']}, 'missing_in_a': {}}
+
+    :param a: a `Database`
+    :param b: another `Database`
+    :param since_a: only consider the documents changed in `a` after this
+                    sequence
+    :param since_b: only consider the documents changed in `b` after this
+                    sequence
+    :param chunk_size: the number of documents per request
+    :return: a dict with the revisions of `a` missing from `b`
+             (``missing_in_b``) and those of `b` missing from `a`
+             (``missing_in_a``), each a mapping of document IDs to revisions
+    """
+    return {
+        'missing_in_b': missing_revisions(a, b, since_a, chunk_size),
+        'missing_in_a': missing_revisions(b, a, since_b, chunk_size),
+    }
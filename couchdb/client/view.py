@@ -1,5 +1,7 @@
 from .__common__ import *
 from .document import Document
+from .exceptions import CouchDBException
+from collections.abc import Mapping, Sequence
 
 class View(object):
     """Abstract representation of a view or query."""
@@ -22,6 +24,77 @@ class View(object):
         return _call_viewlike(self.url, self.session, options)
 
 
+class PreparedView(View):
+    """A view with a fixed set of options that are encoded only once.
+
+    The URL of the view and the query string for the constant `options` are
+    built when the view is prepared; each call then only encodes the options
+    passed to it, typically ``key``, ``startkey``/``endkey`` or ``keys``:
+
+    >>> by_name = db.prepare_view(('people', 'by_name'), include_docs=True,
+    ...                           limit=10)                   # doctest: +SKIP
+    >>> list(by_name(key='John Doe'))                         # doctest: +SKIP
+
+    Options given on a call must not repeat any of the prepared options, and
+    options CouchDB rejects together (such as ``keys`` with ``key``) raise a
+    `ValueError` as soon as the view is prepared or called.
+    """
+
+    def __init__(self, url, wrapper=None, session=None, **options):
+        _check_view_options(options)
+        super().__init__(url, wrapper, session)
+        self.options = options
+        self._query = urlencode(_encode_view_options(options))
+
+    def __call__(self, **options):
+        self._check(options)
+        return ViewResults(self, options)
+
+    def __repr__(self):
+        return '<%s %r %r>' % (type(self).__name__, self.url, self.options)
+
+    def _check(self, options):
+        if not self.options.keys().isdisjoint(options):
+            raise ValueError('options %s are already set on the prepared view' %
+                             ', '.join(sorted(self.options.keys() & options.keys())))
+        _check_view_options(dict(self.options, **options))
+
+    def url_for(self, **options) -> str:
+        """Return the URL of a ``GET`` request with the given varying options
+        added to the prepared ones.
+        """
+        self._check(options)
+        return self._url(options)
+
+    def _url(self, options):
+        # the options are checked already, by __call__ or url_for
+        if not options:
+            return self.url + '?' + self._query if self._query else self.url
+        query = urlencode(_encode_view_options(options))
+        if self._query:
+            query = self._query + '&' + query
+        return self.url + '?' + query
+
+    def _exec(self, options):
+        if 'keys' in options:
+            options = options.copy()
+            keys = {'keys': options.pop('keys')}
+            response = self.session.post(self._url(options), json=keys)
+        else:
+            response = self.session.get(self._url(options))
+        if not response.ok: raise CouchDBException.auto(response)
+        return response.json()
+
+
+def _check_view_options(options):
+    """Raise a `ValueError` for view options that CouchDB rejects together"""
+    if 'keys' in options:
+        conflicts = sorted(options.keys() & {'key', 'startkey', 'start_key',
+                                             'endkey', 'end_key'})
+        if conflicts:
+            raise ValueError('keys cannot be combined with %s' % ', '.join(conflicts))
+
+
 def _encode_view_options(options):
     """Encode any items in the options dict that are sent as a JSON string to a
     view/list function.
@@ -120,22 +193,59 @@ class ViewResults(object):
 
     def _fetch(self):
         data = self.view._exec(self.options)
-        wrapper = self.view.wrapper or Row
-        self._rows = [wrapper(row) for row in data['rows']] if 'rows' in data else []
+        self._rows = ViewColumns(data.get('rows', ()), self.view.wrapper)
         self._total_rows = data.get('total_rows')
         self._offset = data.get('offset', 0)
         self._update_seq = data.get('update_seq')
 
     @property
     def rows(self):
-        """The list of rows returned by the view.
+        """The sequence of rows returned by the view.
 
-        :rtype: `list`
+        Rows are stored column by column and only turned into `Row` objects
+        (or whatever the view's `wrapper` returns) when they are accessed.
+
+        :rtype: `ViewColumns`
         """
         if self._rows is None:
             self._fetch()
         return self._rows
 
+    @property
+    def ids(self):
+        """The document IDs of all rows, in view order.
+
+        :rtype: `list`
+        """
+        return self.rows.ids
+
+    @property
+    def keys(self):
+        """The keys of all rows, in view order.
+
+        :rtype: `list`
+        """
+        return self.rows.keys
+
+    @property
+    def values(self):
+        """The values of all rows, in view order.
+
+        :rtype: `list`
+        """
+        return self.rows.values
+
+    def to_numpy(self, key_dtype=None, value_dtype=None, id_dtype=None):
+        """Export the rows as NumPy arrays, one per column.
+
+        Requires NumPy. See `couchdb.client.arrays.columns_to_numpy` for the
+        layout of the result and the meaning of the dtype arguments.
+
+        :rtype: `dict`
+        """
+        from .arrays import columns_to_numpy
+        return columns_to_numpy(self.rows, key_dtype, value_dtype, id_dtype)
+
     @property
     def total_rows(self):
         """The total number of rows in this view.
@@ -175,32 +285,142 @@ class ViewResults(object):
         return self._update_seq
 
 
-class Row(dict):
-    """Representation of a row as returned by database views."""
+class ViewColumns(Sequence):
+    """Column-oriented storage for the rows of a view result.
+
+    The ``id``, ``key`` and ``value`` members of every row are kept in
+    parallel lists; ``doc`` and ``error`` columns are only allocated when at
+    least one row carries them. Indexing creates the row object on demand:
+    a `Row` by default, or the result of calling `wrapper` with a plain
+    ``dict`` for callers that supply their own row class. Wrapped rows are
+    cached, so repeated access returns the same object.
+    """
+
+    __slots__ = ('ids', 'keys', 'values', 'docs', 'errors', 'wrapper',
+                 '_wrapped')
+
+    def __init__(self, rows, wrapper=None):
+        self.ids = [row.get('id') for row in rows]
+        self.keys = [row.get('key') for row in rows]
+        self.values = [row.get('value') for row in rows]
+        self.docs = self.errors = None
+        if any('doc' in row for row in rows):
+            self.docs = [row.get('doc') for row in rows]
+        if any('error' in row for row in rows):
+            self.errors = [row.get('error') for row in rows]
+        self.wrapper = wrapper
+        self._wrapped = [None] * len(rows) if wrapper is not None else None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self.wrapper is None:
+            return self._row(index)
+        row = self._wrapped[index]
+        if row is None:
+            row = self._wrapped[index] = self.wrapper(self._dict(index))
+        return row
+
+    def __iter__(self):
+        if self.wrapper is not None:
+            return (self[i] for i in range(len(self)))
+        docs = self.docs or itertools.repeat(None)
+        errors = self.errors or itertools.repeat(None)
+        return map(Row._make, self.ids, self.keys, self.values, docs, errors)
+
+    def __repr__(self):
+        return '<%s %d rows>' % (type(self).__name__, len(self))
+
+    def _row(self, index):
+        return Row._make(
+            self.ids[index], self.keys[index], self.values[index],
+            self.docs[index] if self.docs is not None else None,
+            self.errors[index] if self.errors is not None else None,
+        )
+
+    def _dict(self, index):
+        return dict(self._row(index).items())
+
+
+class Row(object):
+    """Representation of a row as returned by database views.
+
+    Rows keep their members in slots rather than in a `dict`, which makes
+    them a lot cheaper for large view results. The mapping interface of
+    the old dict-based rows (``row['key']``, ``row.get('doc')``, ``'id' in
+    row``, ``dict(row)``) is still supported.
+    """
+
+    __slots__ = ('id', 'key', 'value', 'error', '_doc')
+
+    _fields = ('id', 'key', 'doc', 'error', 'value')
+
+    def __init__(self, data=(), **fields):
+        fields = dict(data, **fields)
+        self.id = fields.get('id')
+        self.key = fields.get('key')
+        self.value = fields.get('value')
+        self.error = fields.get('error')
+        self._doc = fields.get('doc')
+
+    @classmethod
+    def _make(cls, id, key, value, doc=None, error=None):
+        row = cls.__new__(cls)
+        row.id = id
+        row.key = key
+        row.value = value
+        row.error = error
+        row._doc = doc
+        return row
 
     def __repr__(self):
-        keys = 'id', 'key', 'doc', 'error', 'value'
-        items = ['%s=%r' % (k, self[k]) for k in keys if k in self]
+        items = ['%s=%r' % (k, self[k]) for k in self]
         return '<%s %s>' % (type(self).__name__, ', '.join(items))
 
-    @property
-    def id(self):
-        """The associated Document ID if it exists. Returns `None` when it
-        doesn't (reduce results).
-        """
-        return self.get('id')
+    def __contains__(self, name):
+        if name == 'key':
+            return True
+        if name == 'value':
+            return self.error is None
+        if name == 'doc':
+            return self._doc is not None
+        return name in ('id', 'error') and getattr(self, name) is not None
 
-    @property
-    def key(self):
-        return self['key']
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return self._doc if name == 'doc' else getattr(self, name)
 
-    @property
-    def value(self):
-        return self.get('value')
+    def __iter__(self):
+        return (name for name in self._fields if name in self)
 
-    @property
-    def error(self):
-        return self.get('error')
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __eq__(self, other):
+        if isinstance(other, (Row, Mapping)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return dict(self.items())
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(name, self[name]) for name in self]
 
     @property
     def doc(self):
@@ -208,6 +428,6 @@ class Row(dict):
         view was accessed with ``include_docs=True`` as a query parameter,
         otherwise this property will be `None`.
         """
-        doc = self.get('doc')
+        doc = self._doc
         if doc:
             return Document(doc)
@@ -9,7 +9,8 @@
 import unittest
 
 from couchdb.tests import client, couch_tests, design, couchhttp, \
-                          multipart, mapping, view, package, loader
+                          multipart, mapping, view, package, loader, \
+                          selector, processing
 
 
 def suite():
@@ -23,6 +24,8 @@ def suite():
     suite.addTest(couch_tests.suite())
     suite.addTest(package.suite())
     suite.addTest(loader.suite())
+    suite.addTest(selector.suite())
+    suite.addTest(processing.suite())
     return suite
 
 
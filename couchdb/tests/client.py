@@ -98,6 +98,26 @@ class ServerTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
         if version >= (0, 10):
             self.assertTrue('_local_id' in result)
 
+    def test_replication_fleet(self):
+        aname, a = self.temp_db()
+        bname, b = self.temp_db()
+        if '_replicator' not in self.server:
+            self.server.create('_replicator')
+        fleet = self.server.replication_fleet()
+        job_id = 'fleet-%s' % aname.replace('/', '-')
+        url = client.DEFAULT_BASE_URL
+        spec = {'source': url + aname.replace('/', '%2F'),
+                'target': url + bname.replace('/', '%2F')}
+        result = fleet.declare({job_id: spec})
+        self.assertEqual([job_id], result['created'])
+        try:
+            self.assertEqual(1, fleet.declare({job_id: spec})['unchanged'])
+            time.sleep(1)
+            self.assertIn(job_id, fleet.status())
+        finally:
+            result = fleet.declare({}, prune=True)
+        self.assertIn(job_id, result['deleted'])
+
     def test_iter(self):
         aname, a = self.temp_db()
         bname, b = self.temp_db()
@@ -310,6 +330,40 @@ class DatabaseTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
         self.assertNotEqual(old_rev, doc['_rev'])
         self.assertEqual(None, self.db['foo'].get('_attachments'))
 
+    def test_download_attachment(self):
+        doc = {}
+        self.db['foo'] = doc
+        content = os.urandom(200000)
+        self.db.put_attachment(doc, content, 'foo.bin', 'application/octet-stream')
+        with self.db.get_attachment('foo', 'foo.bin') as f:
+            self.assertEqual(content[:10], f.read(10))
+            self.assertEqual(content[10:], f.read())
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'foo.bin')
+            self.assertEqual(len(content), self.db.download_attachment(self.db['foo'], 'foo.bin', path))
+            with open(path, 'rb') as f:
+                self.assertEqual(content, f.read())
+            self.assertEqual(['foo.bin'], os.listdir(tmpdir))
+            os.chmod(path, 0o640)
+            self.db.download_attachment('foo', 'foo.bin', path)
+            self.assertEqual(0o640, os.stat(path).st_mode & 0o777)
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertRaises(client.NotFoundException, self.db.download_attachment,
+                          'foo', 'missing.bin', path)
+
+    def test_attachment_of_revision(self):
+        doc = {}
+        self.db['foo'] = doc
+        self.db.put_attachment(doc, b'old', 'foo.bin', 'application/octet-stream')
+        old = self.db['foo']
+        self.db.put_attachment(doc, b'new', 'foo.bin', 'application/octet-stream')
+        # the digest of the old stub is checked against the old content
+        self.assertEqual(b'old', self.db.get_attachment(old, 'foo.bin').read())
+        self.assertEqual(b'new', self.db.get_attachment('foo', 'foo.bin').read())
+
     def test_empty_attachment(self):
         doc = {}
         self.db['foo'] = doc
@@ -343,6 +397,55 @@ class DatabaseTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
         self.assertTrue(doc['_attachments']['test.txt']['content_type'] == 'text/plain')
         shutil.rmtree(tmpdir)
 
+    def test_attachment_streaming_upload(self):
+        import mmap, pathlib
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = pathlib.Path(tmpdir, 'test.bin')
+            content = os.urandom(300000)
+            with open(path, 'wb') as f:
+                f.write(content)
+            doc = {}
+            self.db['foo'] = doc
+            progress = []
+            self.db.put_attachment(doc, path, progress=lambda sent, total: progress.append((sent, total)))
+            self.assertEqual((len(content), len(content)), progress[-1])
+            with open(path, 'rb') as f:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.db.put_attachment(doc, buf, 'mapped.bin')
+                self.db.put_attachment(doc, memoryview(buf)[:1000], 'view.bin')
+                buf.close()
+            doc = self.db['foo']
+            self.assertEqual(len(content), doc['_attachments']['test.bin']['length'])
+            self.assertEqual(content, self.db.get_attachment(doc, 'mapped.bin').read())
+            self.assertEqual(content[:1000], self.db.get_attachment(doc, 'view.bin').read())
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_save_with_attachments(self):
+        import pathlib
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = pathlib.Path(tmpdir, 'test.bin')
+            content = os.urandom(100000)
+            with open(path, 'wb') as f:
+                f.write(content)
+            doc = {'_id': 'foo', 'type': 'report'}
+            self.db.save_with_attachments(doc, {'test.bin': path,
+                                                'notes.txt': ('Foo bar', 'text/plain')})
+            self.assertTrue(doc['_rev'].startswith('1-'))
+            self.assertEqual(content, self.db.get_attachment('foo', 'test.bin').read())
+            self.assertEqual(b'Foo bar', self.db.get_attachment('foo', 'notes.txt').read())
+            # existing attachments are kept when the document is saved again
+            doc['type'] = 'summary'
+            self.db.save_with_attachments(doc, {'more.txt': 'Baz'})
+            doc = self.db['foo']
+            self.assertEqual('summary', doc['type'])
+            self.assertEqual(['more.txt', 'notes.txt', 'test.bin'], sorted(doc['_attachments']))
+            self.assertEqual('text/plain', doc['_attachments']['notes.txt']['content_type'])
+        finally:
+            shutil.rmtree(tmpdir)
+
     def test_attachment_no_filename(self):
         doc = {}
         self.db['foo'] = doc
@@ -404,6 +507,84 @@ class DatabaseTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
             self.assertEqual(set(['name']), doc.keys())
             self.assertEqual(expect[i], doc['name'])
 
+    def test_find_prefetch(self):
+        if self.server.version_info()[0] < 2:
+            return
+
+        for num in range(60):
+            self.db.save(dict(_id='p%d' % num, type='Person', num=num))
+        find = self.db.find({'selector': {'type': 'Person'}, 'limit': 25},
+                            auto_paginate=True, prefetch=2)
+        self.assertEqual(60, len(list(find)))
+
+    def test_find_prefetch_abandoned(self):
+        if self.server.version_info()[0] < 2:
+            return
+
+        for num in range(60):
+            self.db.save(dict(_id='p%d' % num, type='Person', num=num))
+        threads = threading.active_count()
+        find = self.db.find({'selector': {'type': 'Person'}, 'limit': 10},
+                            auto_paginate=True, prefetch=2)
+        for doc in find:
+            break
+        with client.FindIterator(find) as results:
+            next(results)
+        for _ in range(50):
+            if threading.active_count() == threads:
+                break
+            time.sleep(.1)
+        self.assertEqual(threads, threading.active_count())
+
+    def test_find_page_size(self):
+        if self.server.version_info()[0] < 2:
+            return
+
+        for num in range(60):
+            self.db.save(dict(_id='p%d' % num, type='Person', num=num))
+        find = self.db.find({'selector': {'type': 'Person'}, 'limit': 40},
+                            auto_paginate=True)
+        self.assertEqual(60, len(list(find)))
+        sizer = client.AdaptivePageSize(5, target_bytes=10 ** 6, maximum=20)
+        find = self.db.find({'selector': {'type': 'Person'}},
+                            auto_paginate=True, page_size=sizer)
+        self.assertEqual(60, len(list(find)))
+
+    def test_prepare_find(self):
+        if self.server.version_info()[0] < 2:
+            return
+
+        for num in range(30):
+            self.db.save(dict(_id='p%d' % num, type='Person', num=num))
+        query = self.db.prepare_find({
+            'selector': {'type': client.Param('type'), 'num': {'$lt': client.Param('max')}},
+            'limit': 10,
+        })
+        self.assertEqual(5, len(list(self.db.find(query(type='Person', max=5)))))
+        find = self.db.find(query(type='Person', max=25), auto_paginate=True)
+        self.assertEqual(25, len(list(find)))
+        res = self.db.explain(query(type='City', max=1))
+        self.assertEqual({'type': {'$eq': 'City'}, 'num': {'$lt': 1}}, res['selector'])
+        self.assertRaises(TypeError, query, type='Person')
+
+    def test_get_fields(self):
+        if self.server.version_info()[0] < 2:
+            return
+
+        for num in range(10):
+            self.db.save(dict(_id=str(num), type='Person', num=num, big='x' * 100))
+        ids = ['7', 'missing', '2', '5']
+        docs = list(self.db.get_fields(ids, ['num'], chunk_size=3))
+        self.assertEqual(['7', '2', '5'], [doc.id for doc in docs])
+        self.assertEqual(set(['_id', 'num']), set(docs[0].keys()))
+
+        class Wrapper(dict):
+            _fields = ['num']
+        docs = list(self.db.find({'selector': {'type': 'Person'}}, Wrapper,
+                                 auto_paginate=True, fields=True))
+        self.assertEqual(10, len(docs))
+        self.assertEqual(set(['_id', '_rev', 'num']), set(docs[0].keys()))
+
     def test_explain(self):
         if self.server.version_info()[0] < 2:
             return
@@ -415,6 +596,23 @@ class DatabaseTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
         self.assertEqual(0, res['skip'])
         self.assertEqual(self.db.name, res['dbname'])
 
+    def test_index_advisor(self):
+        if self.server.version_info()[0] < 2:
+            return
+        for num in range(20):
+            self.db.save(dict(_id='p%d' % num, type='Person', num=num))
+        advisor = client.IndexAdvisor(self.db)
+        advisor.find({'selector': {'type': 'Person', 'num': {'$gt': 5}}})
+        advisor.find({'selector': {'type': 'Person', 'num': {'$gt': 10}}})
+        self.assertEqual(1, len(advisor))
+        advice = advisor.analyze()
+        self.assertEqual(1, len(advice))
+        self.assertTrue(advice[0].full_scan)
+        self.assertEqual(2, advice[0].runs)
+        self.assertEqual({'index': {'fields': ['type', 'num']}, 'type': 'json'},
+                         advice[0].suggested_index)
+        self.assertTrue('_all_docs' in advisor.report())
+
     def test_index(self):
         if self.server.version_info()[0] < 2:
             return
@@ -457,6 +655,21 @@ class DatabaseTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
         res = list(idx)
         self.assertEqual(1, len(res))
 
+    def test_ensure_indexes(self):
+        if self.server.version_info()[0] < 2:
+            return
+
+        definitions = [
+            {'index': {'fields': ['type']}, 'ddoc': 'foo', 'name': 'bar'},
+            {'index': {'fields': [{'name': 'asc'}]}},
+        ]
+        res = self.db.ensure_indexes(definitions, wait=True, timeout=60)
+        self.assertEqual(['created', 'created'], [r['result'] for r in res])
+        self.assertEqual(3, len(self.db.indexes()))
+        res = self.db.ensure_indexes(definitions)
+        self.assertEqual(['exists', 'exists'], [r['result'] for r in res])
+        self.assertEqual(3, len(self.db.indexes(refresh=True)))
+
     def test_bulk_update_conflict(self):
         docs = [
             dict(type='Person', name='John Doe'),
@@ -491,8 +704,69 @@ class DatabaseTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
 
         doc = self.db.get(doc['_id'], conflicts=True)
         assert '_conflicts' in doc
-        revs = self.db.get(doc['_id'], open_revs='all')
+        revs = list(self.db.open_revs(doc['_id']))
         assert len(revs) == 2
+        self.assertRaises(ValueError, self.db.get, doc['_id'], open_revs='all')
+        revs = list(self.db.open_revs(doc['_id'], doc['_conflicts'] + ['1-missing']))
+        self.assertEqual(doc['_conflicts'], [rev['_rev'] for rev in revs])
+
+        winner, conflicts = self.db.conflicts(doc['_id'])
+        self.assertEqual(doc['_rev'], winner['_rev'])
+        self.assertEqual(doc['_conflicts'], [c['_rev'] for c in conflicts])
+
+    def test_resolve_conflicts(self):
+        self.db['foo'] = {'tags': ['a']}
+        rev = self.db['foo'].rev
+        self.db.bulk_update([{'_id': 'foo', '_rev': '2-aaa', '_revisions': {
+            'start': 2, 'ids': ['aaa', rev.split('-')[1]]}, 'tags': ['b']}], new_edits=False)
+        self.db.bulk_update([{'_id': 'foo', '_rev': '2-bbb', '_revisions': {
+            'start': 2, 'ids': ['bbb', rev.split('-')[1]]}, 'tags': ['c']}], new_edits=False)
+
+        def merge(winner, conflicts):
+            winner['tags'] = sorted(t for doc in [winner] + conflicts for t in doc['tags'])
+            return winner
+        stats = self.db.resolve_conflicts(merge, dry_run=True)
+        self.assertEqual(1, stats['conflicted'])
+        self.assertIn('_conflicts', self.db.get('foo', conflicts=True))
+
+        for source in ('changes', 'all_docs'):
+            stats = self.db.resolve_conflicts(merge, source=source)
+        doc = self.db.get('foo', conflicts=True)
+        self.assertNotIn('_conflicts', doc)
+        self.assertEqual(['b', 'c'], doc['tags'])
+
+    def test_resolve_conflicts_winner_changed(self):
+        self.db['foo'] = {'tags': ['a']}
+        rev = self.db['foo'].rev
+        for suffix, tag in (('aaa', 'b'), ('bbb', 'c')):
+            self.db.bulk_update([{'_id': 'foo', '_rev': '2-' + suffix, '_revisions': {
+                'start': 2, 'ids': [suffix, rev.split('-')[1]]}, 'tags': [tag]}],
+                new_edits=False)
+
+        def merge(winner, conflicts):
+            # the winner is updated between its fetch and the write
+            self.db.save(dict(self.db['foo'], tags=['z']))
+            winner['tags'] = sorted(t for doc in [winner] + conflicts for t in doc['tags'])
+            return winner
+        stats = self.db.resolve_conflicts(merge)
+        self.assertEqual((0, 1, 0), (stats['resolved'], stats['failures'],
+                                     stats['revisions_deleted']))
+        doc = self.db.get('foo', conflicts=True)
+        self.assertEqual(['z'], doc['tags'])
+        self.assertEqual(1, len(doc['_conflicts']))
+
+    def test_open_revs_attachments(self):
+        doc = {'_id': 'foo'}
+        self.db.save(doc)
+        self.db.put_attachment(doc, b'Foo bar', 'foo.txt', 'text/plain')
+        revs = list(self.db.open_revs('foo', attachments=True))
+        self.assertEqual(1, len(revs))
+        self.assertEqual(b'Foo bar', revs[0]['_attachments']['foo.txt']['data'])
+
+    def test_get_revs_info(self):
+        self.db['foo'] = {}
+        doc = self.db.get('foo', revs_info=True)
+        self.assertEqual('available', doc['_revs_info'][0]['status'])
 
     def test_bulk_update_bad_doc(self):
         self.assertRaises(TypeError, self.db.update, [object()])
@@ -613,6 +887,149 @@ class DatabaseTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
         for change in self.db.changes(feed='continuous', heartbeat=100):
             break
 
+    def test_changes_feed(self):
+        for i in range(5):
+            self.db.save({'i': i})
+        feed = self.db.changes_feed('normal')
+        self.assertEqual(5, len(list(feed)))
+        last_seq = feed.last_seq
+        self.assertEqual([2, 2, 1], [len(b) for b in self.db.changes_feed('normal').batches(2)])
+
+        feed = self.db.changes_feed('continuous', since=last_seq, heartbeat=100)
+        def wakeup():
+            time.sleep(.3)
+            self.db.save({'_id': 'late'})
+        threading.Thread(target=wakeup).start()
+        for change in feed:
+            self.assertEqual('late', change['id'])
+            break
+        feed.close()
+
+        feed = self.db.changes_feed('continuous', heartbeat=None)
+        for change in feed:
+            self.assertIn(change['id'], self.db)
+            break
+        feed.close()
+
+    def test_bulk_get(self):
+        self.db['a'] = {'i': 1}
+        results = self.db.bulk_get(['a', 'missing'])
+        self.assertEqual(1, results[0]['docs'][0]['ok']['i'])
+        self.assertIn('error', results[1]['docs'][0])
+
+    def test_changes_feed_documents(self):
+        for i in range(5):
+            self.db['doc%d' % i] = {'i': i}
+        doc = self.db['doc1']
+        doc['i'] = 10
+        self.db.save(doc)
+        self.db.delete(self.db['doc2'])
+        docs = dict((c['id'], c['doc']['i'])
+                    for c in self.db.changes_feed('normal').documents(batch=2))
+        self.assertEqual({'doc0': 0, 'doc1': 10, 'doc3': 3, 'doc4': 4}, docs)
+
+    def test_changes_feed_documents_abandoned(self):
+        for i in range(5):
+            self.db.save({'_id': 'doc%d' % i, 'i': i})
+        threads = threading.active_count()
+        # the long heartbeat keeps the reader blocked once the feed runs dry
+        feed = self.db.changes_feed('continuous', heartbeat=60000)
+        docs = feed.documents(batch=2)
+        next(docs)
+        time.sleep(.5)
+        docs.close()
+        for _ in range(50):
+            if threading.active_count() == threads:
+                break
+            time.sleep(.1)
+        self.assertEqual(threads, threading.active_count())
+
+    def test_changes_feed_checkpoint(self):
+        store = client.LocalDocumentCheckpointStore(self.db, 'consumer')
+        self.assertEqual(None, store.load())
+        for i in range(3):
+            self.db.save({'i': i})
+        checkpointer = client.Checkpointer(store, every=2)
+        self.assertEqual(3, len(list(self.db.changes_feed('normal', checkpoint=checkpointer))))
+        self.assertEqual(checkpointer.seq, store.load())
+        self.db.save({'i': 3})
+        changes = list(self.db.changes_feed('normal', checkpoint=store))
+        self.assertEqual([3], [self.db[c['id']]['i'] for c in changes])
+
+    def test_changes_hub(self):
+        hub = self.db.changes_hub()
+        self.assertIs(hub, self.db.changes_hub())
+        people = hub.subscribe(selector={'type': 'Person'})
+        cities = hub.subscribe(id_prefix='city:')
+        time.sleep(.3)
+        self.db['person:1'] = {'type': 'Person'}
+        self.db['city:1'] = {'type': 'City'}
+        self.assertEqual('person:1', people.get(timeout=5)['id'])
+        self.assertEqual('city:1', cities.get(timeout=5)['id'])
+        self.assertEqual(None, people.get(timeout=.3))
+        hub.close()
+        self.assertEqual(None, cities.get())
+
+    def test_revs_diff(self):
+        self.db['foo'] = {}
+        rev = self.db['foo'].rev
+        self.assertEqual({'bar': {'missing': ['1-abc']}},
+                         self.db.revs_diff({'foo': [rev], 'bar': ['1-abc']}))
+
+    def test_revs_diff_chunks(self):
+        for i in range(5):
+            self.db['doc%d' % i] = {}
+        revs = dict(('doc%d' % i, ['1-abc']) for i in range(7))
+        self.assertEqual(7, len(self.db.revs_diff(revs, chunk_size=2)))
+        self.assertEqual(['1-abc'], self.db.missing_revs(revs, chunk_size=3)['doc6'])
+
+    def test_diff_databases(self):
+        other_name, other = self.temp_db()
+        self.db['a'] = {}
+        other['b'] = {}
+        diff = client.diff_databases(self.db, other, chunk_size=1)
+        self.assertEqual(['a'], list(diff['missing_in_b']))
+        self.assertEqual([other['b'].rev], diff['missing_in_a']['b'])
+
+    def test_replicator(self):
+        target_name, target = self.temp_db()
+        for i in range(7):
+            self.db['doc%d' % i] = {'i': i}
+        stats = client.Replicator(self.db, target, workers=2, batch_size=3).run()
+        self.assertEqual(7, stats['docs_written'])
+        self.assertEqual(self.db['doc3'].rev, target['doc3'].rev)
+
+        doc = self.db['doc3']
+        doc['i'] = 33
+        self.db.save(doc)
+        stats = client.Replicator(self.db, target, workers=2, batch_size=3).run()
+        self.assertEqual(1, stats['docs_read'])
+        self.assertEqual(33, target['doc3']['i'])
+
+    def test_replicator_failure(self):
+        target_name, target = self.temp_db()
+        for i in range(7):
+            self.db['doc%d' % i] = {'i': i}
+        # every batch fails, more of them than the processor keeps pending
+        self.del_db(target_name)
+        replicator = client.Replicator(self.db, target, workers=2, batch_size=1)
+        self.assertRaises(client.NotFoundException, replicator.run)
+        self.assertEqual(0, replicator.stats()['docs_written'])
+
+    def test_process_changes(self):
+        for i in range(3):
+            self.db.save({'_id': 'doc%d' % i})
+        handled = []
+        checkpoints = []
+        last_seq = self.db.process_changes(handled.append, workers=3,
+                                           checkpoint=checkpoints.append)
+        self.assertEqual(3, len(handled))
+        self.assertEqual(last_seq, checkpoints[-1])
+
+        def fail(change):
+            raise ValueError(change['id'])
+        self.assertRaises(ValueError, self.db.process_changes, fail)
+
     def test_purge(self):
         doc = {'a': 'b'}
         self.db['foo'] = doc
@@ -646,6 +1063,16 @@ class ViewTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
         self.assertEqual(list(row.value.keys()), ['rev'])
         self.assertEqual(row.error, None)
 
+    def test_row_columns(self):
+        self.db.save({'_id': 'xyz', 'foo': 'bar'})
+        results = self.db.view('_all_docs', include_docs=True)
+        self.assertEqual(results.ids, ['xyz'])
+        self.assertEqual(results.keys, ['xyz'])
+        row = results.rows[0]
+        self.assertEqual(row['key'], 'xyz')
+        self.assertEqual(row.doc['foo'], 'bar')
+        self.assertEqual(set(dict(row)), set(['id', 'key', 'value', 'doc']))
+
     def test_view_multi_get(self):
         for i in range(1, 6):
             self.db.save({'i': i})
@@ -661,6 +1088,24 @@ class ViewTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
         for idx, i in enumerate(range(1, 6, 2)):
             self.assertEqual(i, res[idx].key)
 
+    def test_prepare_view(self):
+        for i in range(1, 6):
+            self.db.save({'i': i})
+        self.db['_design/test'] = {
+            'language': 'javascript',
+            'views': {
+                'multi_key': {'map': 'function(doc) { emit(doc.i, doc.i * 2); }'}
+            }
+        }
+        view = self.db.prepare_view(('test', 'multi_key'), descending=True)
+        self.assertEqual([6, 4], [row.value for row in view(startkey=3, endkey=2)])
+        self.assertEqual([10], [row.value for row in view(key=5)])
+        self.assertEqual([6, 2], [row.value for row in view(keys=[3, 1])])
+        self.assertRaises(ValueError, view, descending=False)
+        self.assertRaises(ValueError, view, keys=[1], startkey=1)
+        self.assertRaises(ValueError, self.db.prepare_view, ('test', 'multi_key'),
+                          keys=[1], key=1)
+
     def test_ddoc_info(self):
         self.db['_design/test'] = {
             'language': 'javascript',
@@ -943,6 +1388,34 @@ class ViewIterationTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
     def test_nullkeys(self):
         self.assertEqual(len(list(self.db.iterview('test/nulls', 10))), self.num_docs)
 
+    def test_prefetch(self):
+        self.assertEqual([self.docfromrow(row) for row in self.db.iterview('test/nums', 10, prefetch=2)],
+                         [self.docfromnum(num) for num in range(self.num_docs)])
+        rows = list(self.db.iterview('test/nums', 7, prefetch=1, limit=20, skip=5))
+        self.assertEqual([self.docfromrow(row) for row in rows],
+                         [self.docfromnum(num) for num in range(5, 25)])
+
+    def test_parallel_view(self):
+        expected = [self.docfromnum(num) for num in range(self.num_docs)]
+        rows = list(self.db.parallel_view('test/nums', partitions=4, batch=7,
+                                          ordered=True))
+        self.assertEqual([self.docfromrow(row) for row in rows], expected)
+        rows = list(self.db.parallel_view('test/nums', split_points=[10, 30],
+                                          batch=7, workers=2))
+        self.assertEqual(sorted(row['id'] for row in rows),
+                         sorted(doc['_id'] for doc in expected))
+
+    def test_iterview_numpy(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy not installed')
+        batches = list(self.db.iterview_numpy('test/nums', 30, key_dtype='i8'))
+        self.assertEqual([len(b['key']) for b in batches], [30, 30, 30, 10])
+        keys = numpy.concatenate([b['key'] for b in batches])
+        self.assertEqual(keys.tolist(),
+                         [self.docfromnum(num)['num'] for num in range(self.num_docs)])
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(ServerTestCase, 'test'))
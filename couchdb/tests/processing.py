@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from couchdb import client
+
+
+class ArraysTestCase(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy not installed')
+
+    def test_compound_width(self):
+        from couchdb.client.arrays import columns_to_numpy
+        columns = client.ViewColumns([{'id': 'a', 'key': [1, 2], 'value': 1},
+                                      {'id': 'b', 'key': [1, 2, 3], 'value': 2}])
+        self.assertRaisesRegex(ValueError, "row 1 \\(document 'b'\\)",
+                               columns_to_numpy, columns)
+
+
+class ChangesProcessorTestCase(unittest.TestCase):
+
+    def test_failure_backpressure(self):
+        # the failed change is never handled, so the pending window stays full
+        feed = [{'id': 'doc%d' % i, 'seq': i} for i in range(10)]
+
+        def fail(change):
+            time.sleep(.05)
+            if change['seq'] == 0:
+                raise ValueError(change['id'])
+        processor = client.ChangesProcessor(feed, fail, workers=2, max_pending=3)
+        errors = []
+
+        def run():
+            try:
+                processor.run()
+            except ValueError as e:
+                errors.append(e)
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(['doc0'], [e.args[0] for e in errors])
+
+
+class FileCheckpointStoreTestCase(unittest.TestCase):
+
+    def test_concurrent_saves(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            store = client.FileCheckpointStore(os.path.join(tmpdir, 'checkpoint.json'))
+            self.assertEqual(None, store.load())
+
+            def save(i):
+                for _ in range(20):
+                    store.save('%d-abc' % i)
+            threads = [threading.Thread(target=save, args=(i,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertIn(store.load(), ['%d-abc' % i for i in range(4)])
+            self.assertEqual(['checkpoint.json'], os.listdir(tmpdir))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(ArraysTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(ChangesProcessorTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(FileCheckpointStoreTestCase, 'test'))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from couchdb.client import collation
+from couchdb.client.find import selector
+from couchdb.client.find.selector import compile_selector, SelectorError
+from couchdb.tests import testutil
+
+
+DOCS = [
+    {'_id': 'a', 'type': 'Person', 'name': 'John Doe', 'age': 42,
+     'tags': ['admin', 'staff'], 'address': {'city': 'Gotham', 'zip': '10001'}},
+    {'_id': 'b', 'type': 'Person', 'name': 'mary jane', 'age': 17,
+     'tags': ['staff'], 'scores': [3, 8, 12], 'big': 10 ** 20 + 1},
+    {'_id': 'c', 'type': 'City', 'name': 'Gotham City', 'population': None},
+    {'_id': 'd', 'type': 'Person', 'name': 'Bruce', 'age': '42',
+     'tags': [], 'a.b': True},
+]
+
+
+class SelectorTestCase(unittest.TestCase):
+
+    def assertMatches(self, selector, ids):
+        matches = compile_selector(selector)
+        self.assertEqual([doc['_id'] for doc in DOCS if matches(doc)], ids)
+
+    def test_equality(self):
+        self.assertMatches({'type': 'Person'}, ['a', 'b', 'd'])
+        self.assertMatches({'age': 42}, ['a'])
+        self.assertMatches({'age': {'$eq': 42.0}}, ['a'])
+        self.assertMatches({'population': None}, ['c'])
+        self.assertMatches({'tags': 'staff'}, [])
+
+    def test_implicit_and(self):
+        self.assertMatches({'type': 'Person', 'age': 42}, ['a'])
+        self.assertMatches({'address': {'city': 'Gotham'}}, ['a'])
+        self.assertMatches({'address.city': 'Gotham'}, ['a'])
+        self.assertMatches({'a\\.b': True}, ['d'])
+
+    def test_comparison_collation(self):
+        # strings sort after numbers, so '42' is greater than any number
+        self.assertMatches({'age': {'$gt': 20}}, ['a', 'd'])
+        self.assertMatches({'age': {'$gt': 20, '$lt': 100}}, ['a'])
+        self.assertMatches({'name': {'$gte': 'j', '$lt': 'N'}}, ['a', 'b'])
+        self.assertMatches({'population': {'$lt': False}}, ['c'])
+
+    def test_ne_missing(self):
+        self.assertMatches({'age': {'$ne': 42}}, ['b', 'd'])
+        self.assertMatches({'age': {'$exists': False}}, ['c'])
+        self.assertMatches({'age': {'$not': {'$eq': 42}}}, ['b', 'c', 'd'])
+
+    def test_in(self):
+        self.assertMatches({'age': {'$in': [17, '42']}}, ['b', 'd'])
+        self.assertMatches({'age': {'$nin': [17, '42']}}, ['a'])
+        self.assertMatches({'tags': {'$all': ['staff', 'admin']}}, ['a'])
+        self.assertMatches({'tags': {'$all': []}}, [])
+        self.assertMatches({'tags': {'$in': ['admin']}}, ['a'])
+        self.assertMatches({'tags': {'$nin': ['admin']}}, ['b', 'd'])
+        self.assertMatches({'scores': {'$in': [8, 9]}}, ['b'])
+
+    def test_or_nor(self):
+        self.assertMatches({'$or': [{'type': 'City'}, {'age': 17}]}, ['b', 'c'])
+        self.assertMatches({'$nor': [{'type': 'City'}, {'age': 17}]}, ['a', 'd'])
+        self.assertMatches({'$and': [{'type': 'Person'}, {'$not': {'age': 42}}]},
+                           ['b', 'd'])
+
+    def test_arrays(self):
+        self.assertMatches({'tags': {'$elemMatch': {'$eq': 'admin'}}}, ['a'])
+        self.assertMatches({'scores': {'$elemMatch': {'$gt': 10}}}, ['b'])
+        self.assertMatches({'scores': {'$allMatch': {'$gt': 2}}}, ['b'])
+        self.assertMatches({'tags': {'$size': 0}}, ['d'])
+        self.assertMatches({'scores.1': 8}, ['b'])
+        self.assertMatches({'address': {'$keyMapMatch': {'$eq': 'zip'}}}, ['a'])
+
+    def test_misc_operators(self):
+        self.assertMatches({'name': {'$regex': '^[Jj]'}}, ['a'])
+        self.assertMatches({'age': {'$type': 'string'}}, ['d'])
+        self.assertMatches({'age': {'$mod': [5, 2]}}, ['a', 'b'])
+        self.assertMatches({'big': {'$mod': [3, 1]}}, [])
+        self.assertMatches({'big': {'$mod': [3, 2]}}, ['b'])
+        self.assertMatches({'age': {'$mod': [-5, 2]}}, ['a', 'b'])
+
+    def test_invalid(self):
+        self.assertRaises(SelectorError, compile_selector, {'a': {'$foo': 1}})
+        self.assertRaises(SelectorError, compile_selector, {'a': {'$regex': '('}})
+        self.assertRaises(SelectorError, compile_selector, {'$or': []})
+
+    def test_cache(self):
+        self.assertTrue(compile_selector({'type': 'Person'}) is
+                        compile_selector({'type': 'Person'}))
+
+
+class SelectorParityTestCase(testutil.TempDatabaseMixin, unittest.TestCase):
+
+    selectors = [
+        {'type': 'Person'},
+        {'age': {'$gt': 20}},
+        {'name': {'$gte': 'j', '$lt': 'N'}},
+        {'age': {'$ne': 42}},
+        {'$or': [{'type': 'City'}, {'age': 17}]},
+        {'tags': {'$elemMatch': {'$eq': 'admin'}}},
+        {'name': {'$regex': '^[Jj]'}},
+        {'age': {'$in': [17, '42']}},
+        {'tags': {'$in': ['admin']}},
+        {'tags': {'$nin': ['admin']}},
+        {'tags': {'$all': []}},
+        {'big': {'$mod': [3, 1]}},
+        {'big': {'$mod': [3, 2]}},
+        {'age': {'$exists': False}},
+    ]
+
+    def test_parity(self):
+        if self.server.version_info()[0] < 2:
+            return
+        for doc in DOCS:
+            self.db.save(dict(doc))
+        for sel in self.selectors:
+            server = sorted(doc['_id'] for doc in self.db.find({'selector': sel}))
+            matches = compile_selector(sel)
+            local = [doc['_id'] for doc in DOCS if matches(doc)]
+            self.assertEqual(server, local, sel)
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(SelectorTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(SelectorParityTestCase, 'test'))
+    suite.addTest(testutil.doctest_suite(selector))
+    suite.addTest(testutil.doctest_suite(collation))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
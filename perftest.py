@@ -6,11 +6,14 @@ import sys
 import time
 
 import couchdb
+import requests
+
+from couchdb.client.view import _encode_view_options
 
 
 def main(username=None, password=None):
 
-    tests = [create_doc, create_bulk_docs]
+    tests = [create_doc, create_bulk_docs, view_call_overhead]
     if len(sys.argv) > 1:
         tests = [test for test in tests if test.__name__ in sys.argv[1:]]
 
@@ -56,5 +59,25 @@ def create_bulk_docs(db):
         db.update([{'_id': str((i * batch_size) + j)} for j in range(batch_size)])
 
 
+def view_call_overhead(db):
+    """Client-side cost of building view requests, plain vs prepared"""
+    calls = 20000
+    options = {'include_docs': True, 'limit': 10, 'stale': 'ok'}
+
+    start = time.time()
+    for i in range(calls):
+        view = couchdb.View(db._view_url(('test', 'by_num')), None, db.session)
+        params = _encode_view_options(dict(options, key=i))
+        requests.Request('GET', view.url, params=params).prepare()
+    plain = time.time() - start
+
+    start = time.time()
+    prepared = db.prepare_view(('test', 'by_num'), **options)
+    for i in range(calls):
+        requests.Request('GET', prepared.url_for(key=i)).prepare()
+    print("  plain %0.1fus/call, prepared %0.1fus/call" % (
+        plain / calls * 1e6, (time.time() - start) / calls * 1e6))
+
+
 if __name__ == '__main__':
     main(*sys.argv[1:])